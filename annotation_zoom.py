@@ -1,12 +1,31 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw
+from tkinter import filedialog, messagebox, simpledialog
+import tkinter.font as tkfont
+from PIL import Image, ImageTk
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import OrderedDict, deque
+import threading
+import multiprocessing
+import argparse
+import bisect
+import fnmatch
+import hashlib
+import itertools
+import math
+import mmap
+import re
+import struct
+import time
 import os
 import json
 
 
+DEFAULTDISKCACHEDIR = os.path.join(os.path.expanduser('~'), '.joly_annotator', 'pixelcache')
+DEFAULTTHUMBNAILDIR = os.path.join(os.path.expanduser('~'), '.joly_annotator', 'thumbnails')
+
+
 class BoundingBox:
-    """Class to represent a bounding box"""
+    """Class to represent a bounding box in original-image pixel coordinates"""
     CLASSIFICATIONS = {
         'M': 'Macula',
         'H': 'Hemorrhages',
@@ -20,6 +39,7 @@ class BoundingBox:
         'V': 'Vitreous hemorrhage',
         'O': 'Other'
     }
+    HITMARGIN = 5  # Click tolerance around the box edges, in canvas pixels
 
     def __init__(self, x1, y1, x2, y2, canvasid=None):
         self.x1 = min(x1, x2)
@@ -29,12 +49,24 @@ class BoundingBox:
         self.canvasid = canvasid
         self.selected = False
         self.classification = None
+        # Canvas projection cache: the view (scale, offsetx, offsety) it was computed for
+        self.projectedview = None
+        self.projectedcoords = None
 
     def get_coords(self):
         return self.x1, self.y1, self.x2, self.y2
 
-    def contains_point(self, x, y):
-        margin = 5
+    def canvas_coords(self, view):
+        """Canvas coordinates under view (scale, offsetx, offsety), cached until the view changes"""
+        if view != self.projectedview:
+            scale, offsetx, offsety = view
+            self.projectedcoords = (self.x1 * scale + offsetx, self.y1 * scale + offsety,
+                                    self.x2 * scale + offsetx, self.y2 * scale + offsety)
+            self.projectedview = view
+        return self.projectedcoords
+
+    def contains_point(self, x, y, margin):
+        """Whether (x, y) is within margin of the box, all in original-image pixels"""
         return (self.x1 - margin) <= x <= (self.x2 + margin) and (self.y1 - margin) <= y <= (self.y2 + margin)
 
     def get_color(self):
@@ -49,25 +81,1369 @@ class BoundingBox:
         return self.CLASSIFICATIONS.get(self.classification, 'Unclassified')
 
 
+class BoxIndex:
+    """Uniform-grid spatial index over bounding boxes
+
+    Works in original-image pixels. Each box is registered in every cell its extent touches, so
+    point and rectangle queries only look at the boxes in a few cells instead of the whole list.
+    """
+
+    def __init__(self, cellsize=128):
+        self.cellsize = cellsize
+        self.cells = {}  # (cellx, celly) -> set of boxes
+        self.boxcells = {}  # box -> cells it is registered in
+        self.order = {}  # box -> insertion serial, later boxes are drawn on top
+        self.serial = 0
+
+    def cellrange(self, x1, y1, x2, y2):
+        size = self.cellsize
+        return [(cellx, celly)
+                for cellx in range(int(x1 // size), int(x2 // size) + 1)
+                for celly in range(int(y1 // size), int(y2 // size) + 1)]
+
+    def insert(self, bbox):
+        cells = self.cellrange(bbox.x1, bbox.y1, bbox.x2, bbox.y2)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(bbox)
+        self.boxcells[bbox] = cells
+        if bbox not in self.order:
+            self.serial += 1
+            self.order[bbox] = self.serial
+
+    def remove(self, bbox):
+        for cell in self.boxcells.pop(bbox, ()):
+            boxes = self.cells.get(cell)
+            if boxes is not None:
+                boxes.discard(bbox)
+                if not boxes:
+                    del self.cells[cell]
+        self.order.pop(bbox, None)
+
+    def clear(self):
+        self.cells.clear()
+        self.boxcells.clear()
+        self.order.clear()
+        self.serial = 0
+
+    def atpoint(self, x, y, margin):
+        """Topmost box within margin of the point, or None"""
+        candidates = [bbox for bbox in self.intersecting(x - margin, y - margin, x + margin, y + margin)
+                      if bbox.contains_point(x, y, margin)]
+        return candidates[-1] if candidates else None
+
+    def intersecting(self, x1, y1, x2, y2):
+        """Boxes overlapping the rectangle, in drawing order"""
+        found = set()
+        for cell in self.cellrange(x1, y1, x2, y2):
+            found.update(self.cells.get(cell, ()))
+        return sorted((bbox for bbox in found if bbox.x2 >= x1 and bbox.x1 <= x2 and bbox.y2 >= y1 and bbox.y1 <= y2),
+                      key=self.order.get)
+
+
+def fitimage(imagesize, canvassize):
+    """Return (scale, width, height, offsetx, offsety) that fits an image centred on the canvas"""
+    imgwidth, imgheight = imagesize
+    canvaswidth, canvasheight = canvassize
+    scale = min(canvaswidth / imgwidth, canvasheight / imgheight)
+    newwidth = int(imgwidth * scale)
+    newheight = int(imgheight * scale)
+    return scale, newwidth, newheight, (canvaswidth - newwidth) // 2, (canvasheight - newheight) // 2
+
+
+def pyramidlevelfor(scale):
+    """Coarsest power-of-two pyramid level that still has at least scale output pixels per source pixel"""
+    if scale >= 1.0:
+        return 0
+    return int(math.floor(math.log2(1.0 / scale)))
+
+
+class PreprocessedIndex:
+    """Filename index of the preprocessed folder, built with a single os.scandir
+
+    Lookups are dictionary hits instead of one os.path.exists per candidate extension, which
+    matters on network shares. The index is rebuilt when the folder's modification time changes,
+    checked at most once every refreshinterval seconds.
+    """
+
+    def __init__(self, folder, extensions, refreshinterval=2.0):
+        self.folder = folder
+        self.extensions = extensions
+        self.refreshinterval = refreshinterval
+        self.names = {}  # normcase(name) -> name on disk
+        self.foldermtime = None
+        self.lastcheck = 0.0
+        self.lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.lastcheck < self.refreshinterval:
+                return
+            self.lastcheck = now
+            foldermtime = os.stat(self.folder).st_mtime_ns
+            if not force and foldermtime == self.foldermtime:
+                return
+            names = {}
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        names[os.path.normcase(entry.name)] = entry.name
+            self.names = names
+            self.foldermtime = foldermtime
+            print(f"Indexed {len(names)} files in preprocessed folder {self.folder}")
+
+    def find(self, filename):
+        """Preprocessed counterpart of filename: same basename with any image extension, then the exact name"""
+        try:
+            self.refresh()
+        except OSError as e:
+            print(f"Could not refresh preprocessed index: {e}")
+        names = self.names
+        basename = os.path.splitext(os.path.basename(filename))[0]
+        for candidate in [basename + ext for ext in self.extensions] + [os.path.basename(filename)]:
+            name = names.get(os.path.normcase(candidate))
+            if name is not None:
+                return os.path.join(self.folder, name)
+        return None
+
+    def missing(self, filenames):
+        """Filenames with no preprocessed counterpart"""
+        return [filename for filename in filenames if self.find(filename) is None]
+
+
+class AnnotationIndex:
+    """Which images in a folder have an annotation sidecar
+
+    Sidecars are <basename>.txt next to the images. The folder scan adds them as it finds them and the
+    viewer keeps the set current as it writes and reads sidecars, so refreshing the file list needs no
+    filesystem calls.
+    """
+
+    def __init__(self, sidecars=()):
+        self.stems = set()  # normcase(basename) of every sidecar
+        for sidecar in sidecars:
+            self.add(sidecar)
+
+    @staticmethod
+    def key(filename):
+        return os.path.normcase(os.path.splitext(filename)[0])
+
+    def has(self, filename):
+        """Whether the image filename has an annotation sidecar"""
+        return self.key(filename) in self.stems
+
+    def add(self, filename):
+        self.stems.add(self.key(filename))
+
+    def discard(self, filename):
+        self.stems.discard(self.key(filename))
+
+
+class FilenameSearchIndex:
+    """Lowercased filenames with a trigram index for fast search
+
+    A query is a plain substring, a glob when it contains *, ? or [, or a regular expression when
+    prefixed with re:. Substrings and the literal runs of globs are narrowed with the trigram
+    postings first, so only names that contain every trigram are compared.
+    """
+    GLOBCHARS = '*?['
+
+    def __init__(self, filenames=()):
+        self.names = []
+        self.trigrams = {}  # trigram -> ascending file indices whose name contains it
+        for filename in filenames:
+            self.add(filename)
+
+    def add(self, filename):
+        """Index filename as the next file index"""
+        index = len(self.names)
+        name = filename.lower()
+        self.names.append(name)
+        for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+            self.trigrams.setdefault(trigram, []).append(index)
+        return index
+
+    def replace(self, index, filename):
+        """Re-index the file at index under a new filename"""
+        oldname = self.names[index]
+        name = filename.lower()
+        self.names[index] = name
+        oldtrigrams = {oldname[i:i + 3] for i in range(len(oldname) - 2)}
+        newtrigrams = {name[i:i + 3] for i in range(len(name) - 2)}
+        for trigram in oldtrigrams - newtrigrams:
+            self.trigrams[trigram].remove(index)
+        for trigram in newtrigrams - oldtrigrams:
+            bisect.insort(self.trigrams.setdefault(trigram, []), index)
+
+    def candidates(self, literals):
+        """Ascending indices of names containing every trigram of literals, or None if none is long enough"""
+        postings = []
+        for literal in literals:
+            for i in range(len(literal) - 2):
+                posting = self.trigrams.get(literal[i:i + 3])
+                if posting is None:
+                    return []
+                postings.append(posting)
+        if not postings:
+            return None
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result.intersection_update(posting)
+            if not result:
+                break
+        return sorted(result)
+
+    def matcher(self, query):
+        """Predicate on lowercased names for query and the literals that narrow it
+
+        The predicate is None for an empty query, which matches everything. Raises re.error for a bad regex.
+        """
+        query = query.strip()
+        if not query:
+            return None, []
+        if query.lower().startswith('re:'):
+            return re.compile(query[3:], re.IGNORECASE).search, []
+        if any(char in query for char in self.GLOBCHARS):
+            pattern = query.lower()
+            return re.compile(fnmatch.translate(pattern)).match, re.split(r'[*?]|\[[^\]]*\]?', pattern)
+        text = query.lower()
+        return (lambda name: text in name), [text]
+
+    def search(self, query):
+        """Ascending file indices matching query, produced lazily; raises re.error for a bad regex"""
+        names = self.names
+        match, literals = self.matcher(query)
+        if match is None:
+            return iter(range(len(names)))
+        candidates = self.candidates(literals)
+        indices = range(len(names)) if candidates is None else candidates
+        return (i for i in indices if match(names[i]))
+
+
+def classifyentry(entry, extensions, recursive):
+    """'image', 'sidecar' or 'folder' for a scandir entry worth tracking, otherwise None"""
+    if entry.is_dir(follow_symlinks=False):
+        return 'folder' if recursive and not entry.name.startswith('.') else None
+    if entry.is_file():
+        lowername = entry.name.lower()
+        if lowername.endswith(extensions):
+            return 'image'
+        if lowername.endswith('.txt'):
+            return 'sidecar'
+    return None
+
+
+def scanimagefolder(folderpath, extensions, recursive, cancelled, batches, batchsize=500, watcher=None,
+                    baseline=None):
+    """Find images and annotation sidecars under folderpath with os.scandir
+
+    Runs on a worker thread and appends (images, sidecars) batches of paths relative to folderpath
+    to the batches deque as it goes. Subfolders are visited breadth first when recursive, skipping
+    hidden ones and symlinks. Stops early once the cancelled event is set. Every fully listed folder
+    is recorded in watcher, if given, as the baseline for change polling. Folders whose mtime still
+    matches their entry in baseline (a manifest's 'folders') are taken from it without listing.
+    """
+    baseline = baseline or {}
+    pending = deque([''])
+    images, sidecars = [], []
+    while pending and not cancelled.is_set():
+        relative = pending.popleft()
+        folder = os.path.join(folderpath, relative)
+        folderimages, foldersidecars, subfolders = set(), set(), set()
+        try:
+            # Stat before listing so a change made during the listing shows up at the next poll
+            mtime = os.stat(folder).st_mtime_ns
+            known = baseline.get(relative)
+            if known and known['mtime'] == mtime:
+                folderimages = set(known['images'])
+                foldersidecars, subfolders = set(known['sidecars']), set(known['subfolders'])
+                pending.extend(subfolders)
+                names = list(folderimages)
+                sidecars.extend(foldersidecars)
+                for start in range(0, len(names), batchsize):
+                    images.extend(names[start:start + batchsize])
+                    if len(images) >= batchsize:
+                        batches.append((images, sidecars))
+                        images, sidecars = [], []
+                if watcher is not None:
+                    watcher.record(relative, mtime, folderimages, foldersidecars, subfolders)
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if cancelled.is_set():
+                        break
+                    name = os.path.join(relative, entry.name) if relative else entry.name
+                    try:
+                        kind = classifyentry(entry, extensions, recursive)
+                        if kind == 'folder':
+                            pending.append(name)
+                            subfolders.add(name)
+                        elif kind == 'image':
+                            images.append(name)
+                            folderimages.add(name)
+                        elif kind == 'sidecar':
+                            sidecars.append(name)
+                            foldersidecars.add(name)
+                    except OSError:
+                        continue
+                    if len(images) >= batchsize:
+                        batches.append((images, sidecars))
+                        images, sidecars = [], []
+        except OSError as e:
+            if not relative:
+                raise
+            print(f"Could not scan {folder}: {e}")
+            continue
+        if watcher is not None and not cancelled.is_set():
+            watcher.record(relative, mtime, folderimages, foldersidecars, subfolders)
+    batches.append((images, sidecars))
+
+
+class FolderManifest:
+    """Folder metadata kept in .joly_annotator/manifest.json inside the image folder
+
+    Holds the watcher baseline (folder mtimes, image, sidecar and subfolder names), the
+    dimensions of images whose header has been read, and the per-class box counts of each sidecar
+    with the sidecar's mtime. On reopen only folders and sidecars whose mtime changed are read
+    again. The file lives in a hidden subfolder so rewriting it leaves the image folder's own
+    mtime, which the baseline relies on, untouched; the subfolder is created before the scan stats
+    the image folder for the same reason.
+    """
+    VERSION = 2
+
+    def __init__(self, folderpath):
+        self.folderpath = folderpath
+        self.path = os.path.join(folderpath, '.joly_annotator', 'manifest.json')
+
+    def createfolder(self):
+        """Create the hidden subfolder, which changes the image folder's mtime the first time"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        except OSError as e:
+            print(f"Could not create {os.path.dirname(self.path)}: {e}")
+
+    def load(self, recursive):
+        """Stored manifest, or None if missing, unreadable, from another version or another scan mode"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring folder manifest {self.path}: {e}")
+            return None
+        if not isinstance(data, dict) or data.get('version') != self.VERSION or data.get('recursive') != recursive:
+            return None
+        if not self.wellformed(data):
+            print(f"Ignoring malformed folder manifest {self.path}")
+            return None
+        return data
+
+    @staticmethod
+    def wellformed(data):
+        """Whether every entry has the shape the scan, size priming and counting expect"""
+        def names(values):
+            return isinstance(values, list) and all(isinstance(value, str) for value in values)
+
+        folders, images, annotations = data.get('folders'), data.get('images'), data.get('annotations')
+        if not (isinstance(folders, dict) and isinstance(images, dict) and isinstance(annotations, dict)):
+            return False
+        for entry in folders.values():
+            if not (isinstance(entry, dict) and isinstance(entry.get('mtime'), int)
+                    and all(names(entry.get(key)) for key in ('images', 'sidecars', 'subfolders'))):
+                return False
+        for entry in images.values():
+            if not (isinstance(entry, dict) and all(isinstance(entry.get(key), int)
+                                                    for key in ('mtime', 'width', 'height'))):
+                return False
+        for entry in annotations.values():
+            if not (isinstance(entry, dict) and isinstance(entry.get('sidecar'), str)
+                    and isinstance(entry.get('mtime'), int) and isinstance(entry.get('counts'), dict)
+                    and all(isinstance(count, int) for count in entry['counts'].values())):
+                return False
+        return True
+
+    def save(self, watcher, imagesizes, annotationcounts):
+        """Write the manifest; runs on the worker that owns watcher"""
+        data = {
+            'version': self.VERSION,
+            'recursive': watcher.recursive,
+            'folders': {relative: {'mtime': mtime,
+                                   'images': sorted(watcher.images[relative]),
+                                   'sidecars': sorted(watcher.sidecars[relative]),
+                                   'subfolders': sorted(watcher.subfolders[relative])}
+                        for relative, mtime in watcher.mtimes.items()},
+            'images': imagesizes,
+            'annotations': annotationcounts
+        }
+        tmppath = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmppath, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmppath, self.path)
+        except OSError as e:
+            print(f"Could not write folder manifest {self.path}: {e}")
+
+
+def validatesidecarcounts(folderpath, counts):
+    """Entries of counts whose sidecar still has the recorded mtime"""
+    valid = {}
+    for key, entry in counts.items():
+        try:
+            if os.stat(os.path.join(folderpath, entry['sidecar'])).st_mtime_ns == entry['mtime']:
+                valid[key] = entry
+        except (OSError, KeyError, TypeError):
+            continue
+    return valid
+
+
+def readsidecarcounts(folderpath, sidecars):
+    """Per-class box counts of sidecar files, keyed like AnnotationIndex
+
+    Empty or unparsable sidecars count as saves with no boxes.
+    """
+    counts = {}
+    for sidecar in sidecars:
+        path = os.path.join(folderpath, sidecar)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with open(path, 'r') as f:
+                content = f.read().strip()
+        except OSError:
+            continue
+        classcounts = {}
+        if content:
+            try:
+                for annotation in json.loads(content).get('annotations', []):
+                    key = annotation['classification']['key']
+                    classcounts[key] = classcounts.get(key, 0) + 1
+            except (ValueError, AttributeError, KeyError, TypeError):
+                classcounts = {}
+        counts[AnnotationIndex.key(sidecar)] = {'sidecar': sidecar, 'mtime': mtime, 'counts': classcounts}
+    return counts
+
+
+def countsidecars(watcher, known, stored):
+    """Class counts of every sidecar the watcher has seen whose key is not in known; runs on its worker
+
+    Entries of stored (from the manifest) are reused when their sidecar's mtime still matches;
+    the remaining sidecars are read.
+    """
+    counts = validatesidecarcounts(watcher.folderpath,
+                                   {key: entry for key, entry in stored.items() if key not in known})
+    sidecars = [sidecar for names in watcher.sidecars.values() for sidecar in names
+                if AnnotationIndex.key(sidecar) not in known and AnnotationIndex.key(sidecar) not in counts]
+    counts.update(readsidecarcounts(watcher.folderpath, sidecars))
+    return counts
+
+
+def openimagefolder(folderpath, extensions, recursive, cancelled, batches, watcher, manifest):
+    """Scan folderpath, reusing the folder listings its manifest still vouches for
+
+    Returns the manifest's image sizes and sidecar counts. The counts are not validated here, as
+    that takes a stat per sidecar; countsidecars does it in the background after the scan.
+    """
+    data = manifest.load(recursive) or {}
+    # Before the scan records the folder's mtime, so the first manifest write doesn't outdate it
+    manifest.createfolder()
+    scanimagefolder(folderpath, extensions, recursive, cancelled, batches, watcher=watcher,
+                    baseline=data.get('folders'))
+    return data.get('images', {}), data.get('annotations', {})
+
+
+class FolderWatcher:
+    """Polls a scanned image folder for added, removed and renamed files
+
+    Each poll stats the known folders and lists again only those whose modification time changed,
+    diffing them against the last listing, so an unchanged tree costs one stat per folder. Listings
+    keep names only; reading inodes would cost a system call per file on Windows. A rename shows up
+    as a removal plus an addition, so only added files are stat'ed: one whose modification time is
+    older than the previous poll existed before under another name and is paired with a removed
+    name of the same extension, preferring the same basename, then the same folder. Copies that keep
+    their mtime can be mispaired, so the viewer checks a pair against the image on screen before
+    carrying that image over to the new name.
+    poll runs on a worker thread; the viewer applies the changes it returns.
+    """
+
+    def __init__(self, folderpath, extensions, recursive):
+        self.folderpath = folderpath
+        self.extensions = extensions
+        self.recursive = recursive
+        self.mtimes = {}  # relative folder -> st_mtime_ns at its last listing
+        self.images = {}  # relative folder -> set of image names
+        self.sidecars = {}  # relative folder -> set of sidecar names
+        self.subfolders = {}  # relative folder -> set of subfolder names
+        self.lastpoll = time.time()  # Files modified before this were already there at the last look
+
+    def record(self, relative, mtime, images, sidecars, subfolders):
+        self.mtimes[relative] = mtime
+        self.images[relative] = images
+        self.sidecars[relative] = sidecars
+        self.subfolders[relative] = subfolders
+
+    def forget(self, relative):
+        """Drop a folder; returns its last (images, sidecars, subfolders)"""
+        self.mtimes.pop(relative, None)
+        return (self.images.pop(relative, set()), self.sidecars.pop(relative, set()),
+                self.subfolders.pop(relative, set()))
+
+    def listfolder(self, relative):
+        """Record a fresh listing of a folder; False if it no longer exists"""
+        folder = os.path.join(self.folderpath, relative)
+        images, sidecars, subfolders = set(), set(), set()
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    name = os.path.join(relative, entry.name) if relative else entry.name
+                    try:
+                        kind = classifyentry(entry, self.extensions, self.recursive)
+                        if kind == 'folder':
+                            subfolders.add(name)
+                        elif kind == 'image':
+                            images.add(name)
+                        elif kind == 'sidecar':
+                            sidecars.add(name)
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        self.record(relative, mtime, images, sidecars, subfolders)
+        return True
+
+    def poll(self):
+        """Changes since the last poll as (added, removed, renamed, sidecarsadded, sidecarsremoved)
+
+        added and removed are image names, renamed is a list of (old name, new name).
+        """
+        polltime = time.time()
+        changed = deque()
+        for relative, mtime in list(self.mtimes.items()):
+            try:
+                if os.stat(os.path.join(self.folderpath, relative)).st_mtime_ns != mtime:
+                    changed.append(relative)
+            except OSError:
+                changed.append(relative)
+
+        added, removed = set(), set()
+        sidecarsadded, sidecarsremoved = set(), set()
+        while changed:
+            relative = changed.popleft()
+            oldimages, oldsidecars, oldsubfolders = self.forget(relative)
+            if self.listfolder(relative):
+                images, sidecars, subfolders = self.images[relative], self.sidecars[relative], self.subfolders[relative]
+            else:
+                images, sidecars, subfolders = set(), set(), set()
+            added |= images - oldimages
+            removed |= oldimages - images
+            sidecarsadded |= sidecars - oldsidecars
+            sidecarsremoved |= oldsidecars - sidecars
+            # New subfolders get their first listing; vanished ones are listed to report their files removed
+            changed.extend(subfolders ^ oldsubfolders)
+
+        # An added file older than the previous poll was renamed or moved from a removed name
+        renamed = []
+        if added and removed:
+            unpaired = sorted(removed)
+            for name in sorted(added):
+                try:
+                    if os.stat(os.path.join(self.folderpath, name)).st_mtime >= self.lastpoll:
+                        continue
+                except OSError:
+                    continue
+                # Prefer a removed name with the same basename (a move), then one in the same folder
+                extension = os.path.splitext(name)[1].lower()
+                candidates = [old for old in unpaired if os.path.splitext(old)[1].lower() == extension]
+                if candidates:
+                    oldname = max(candidates, key=lambda old: (os.path.basename(old) == os.path.basename(name),
+                                                               os.path.dirname(old) == os.path.dirname(name)))
+                    unpaired.remove(oldname)
+                    renamed.append((oldname, name))
+                    added.discard(name)
+                    removed.discard(oldname)
+        self.lastpoll = polltime
+        if not (added or removed or renamed or sidecarsadded or sidecarsremoved):
+            return None
+        return sorted(added), sorted(removed), renamed, sidecarsadded, sidecarsremoved
+
+
+class DiskPixelCache:
+    """Decoded pixels on disk in a raw, memory-mappable format
+
+    Each entry is a small header followed by the image's raw bytes, so a hit maps the file and
+    hands the buffer to Image.frombuffer without decompressing anything. Entries are keyed by a hash
+    of the source path, size, modification time and pyramid level. Once the cache grows past limit
+    bytes the least recently used entries are deleted.
+    """
+    HEADER = struct.Struct('<4s8sII')
+    MAGIC = b'JPX1'
+    MODES = ('L', 'LA', 'RGB', 'RGBA', 'CMYK', 'I', 'F', 'I;16')
+
+    def __init__(self, directory, limit=4 * 1024 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='diskcache')
+        self.nbytes = sum(size for _, _, size in self.listentries())
+
+    def listentries(self):
+        """(mtime, path, size) for every cache entry"""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.pix') and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def entrypath(self, path, stat, level):
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{level}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pix')
+
+    def load(self, path, stat, level):
+        """Memory-mapped image for path at a pyramid level, or None on a miss"""
+        entrypath = self.entrypath(path, stat, level)
+        try:
+            with open(entrypath, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, mode, width, height = self.HEADER.unpack_from(mapped)
+            if magic != self.MAGIC:
+                return None
+            mode = mode.rstrip(b'\0').decode('ascii')
+            # L, RGBA, CMYK and I;16 share the mapping; other modes are copied out of it once
+            image = Image.frombuffer(mode, (width, height), memoryview(mapped)[self.HEADER.size:], 'raw', mode, 0, 1)
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entrypath)
+            return image
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def store(self, path, stat, level, image):
+        """Write image to the cache in the background"""
+        if image.mode not in self.MODES:
+            return
+        entrypath = self.entrypath(path, stat, level)
+        if not os.path.exists(entrypath):
+            self.writer.submit(self.write, entrypath, image)
+
+    def write(self, entrypath, image):
+        tmppath = entrypath + '.tmp'
+        try:
+            data = image.tobytes()
+            with open(tmppath, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, image.mode.encode('ascii'), image.width, image.height))
+                f.write(data)
+            os.replace(tmppath, entrypath)
+        except OSError as e:
+            print(f"Could not write disk cache entry: {e}")
+            return
+        with self.lock:
+            self.nbytes += self.HEADER.size + len(data)
+            overlimit = self.nbytes > self.limit
+        if overlimit:
+            self.evict()
+
+    def evict(self, limit=None):
+        """Delete least recently used entries until the cache fits in 90% of limit; returns (count, bytes)"""
+        limit = self.limit if limit is None else limit
+        with self.lock:
+            entries = sorted(self.listentries())
+            total = sum(size for _, _, size in entries)
+            removed = freed = 0
+            for _, entrypath, size in entries:
+                if total - freed <= limit * 0.9:
+                    break
+                try:
+                    os.remove(entrypath)
+                except OSError:
+                    # Still mapped by this process on Windows; it goes on a later pass
+                    continue
+                removed += 1
+                freed += size
+            self.nbytes = total - freed
+        return removed, freed
+
+    def clear(self):
+        """Delete every entry; returns (count, bytes)"""
+        return self.evict(limit=0)
+
+    def shutdown(self):
+        self.writer.shutdown(wait=False, cancel_futures=True)
+
+
+def displayready(image):
+    """RGB version of image for on-screen use; high bit-depth greyscale is stretched to 8 bits"""
+    if image.mode == 'RGB':
+        return image
+    if image.mode in ('I;16', 'I;16L', 'I;16B', 'I', 'F'):
+        image = image.convert('F') if image.mode == 'F' else image.convert('I')
+        low, high = image.getextrema()
+        scale = 255.0 / (high - low) if high > low else 1.0
+        image = image.point(lambda value: (value - low) * scale).convert('L')
+    return image.convert('RGB')
+
+
+def reduceimage(image, factor):
+    """image.reduce(factor), first converting modes reduce can't handle (palette, bilevel, 16-bit)"""
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    elif image.mode == '1':
+        image = image.convert('L')
+    elif image.mode.startswith('I;16'):
+        image = image.convert('I')
+    return image.reduce(factor)
+
+
+def imagenbytes(image):
+    """Approximate memory held by a decoded image"""
+    bytesperband = {'I;16': 2, 'I': 4, 'F': 4}.get(image.mode, 1)
+    return image.width * image.height * len(image.getbands()) * bytesperband
+
+
+class ImageCache:
+    """Byte-bounded LRU cache of decoded images and canvas renditions, shared with prefetch workers"""
+
+    def __init__(self, budget=1024 * 1024 * 1024, diskcache=None):
+        self.budget = budget
+        self.diskcache = diskcache  # Optional DiskPixelCache behind the in-memory entries
+        self.entries = OrderedDict()  # key -> (image, nbytes)
+        self.sizes = {}  # (path, mtime) -> full-resolution size read from the file header
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, image):
+        nbytes = imagenbytes(image)
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (image, nbytes)
+            self.nbytes += nbytes
+            self.evict()
+
+    def evict(self):
+        # Always keep the newest entry, even when it alone exceeds the budget
+        while self.nbytes > self.budget and len(self.entries) > 1:
+            _, (_, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            hitrate = 100.0 * self.hits / lookups if lookups else 0.0
+            return (f"{len(self.entries)} entries, {self.nbytes / 1048576:.0f}/{self.budget / 1048576:.0f} MB, "
+                    f"{self.hits} hits, {self.misses} misses ({hitrate:.0f}% hit rate)")
+
+    def open(self, path):
+        """Full-resolution decoded image for path (pyramid level 0)"""
+        return self.pyramidlevel(path, 0)
+
+    def pyramidlevel(self, path, level):
+        """Image pyramid level of path at 1/2**level resolution, generated once and cached
+
+        Keys include the modification time so edited files are re-read. A level is reduced from
+        the nearest finer level already in memory, then looked up in the disk cache; otherwise
+        JPEGs are decoded in draft mode at the DCT scale (1/2, 1/4 or 1/8) closest to the level,
+        skipping most of a full decode.
+        """
+        stat = os.stat(path)
+        mtime = stat.st_mtime_ns
+        image = self.get(('level', path, mtime, level))
+        if image is not None:
+            return image
+        for finer in range(level - 1, -1, -1):
+            with self.lock:
+                entry = self.entries.get(('level', path, mtime, finer))
+            if entry is not None:
+                image = reduceimage(entry[0], 2 ** (level - finer))
+                break
+        else:
+            image = self.diskcache.load(path, stat, level) if self.diskcache else None
+            if image is not None:
+                self.put(('level', path, mtime, level), image)
+                return image
+            image = Image.open(path)
+            fullsize = image.size
+            if level:
+                # Floor, not ceil: draft keeps at least the requested size, so rounding up on an odd
+                # dimension would make it fall back to a full-resolution decode
+                image.draft(image.mode, (max(1, fullsize[0] >> level), max(1, fullsize[1] >> level)))
+            image.load()
+            with self.lock:
+                self.sizes[(path, mtime)] = fullsize
+            decodedfactor = max(1, round(fullsize[0] / image.width))
+            if decodedfactor < 2 ** level:
+                image = reduceimage(image, 2 ** level // decodedfactor)
+        if self.diskcache:
+            self.diskcache.store(path, stat, level, image)
+        self.put(('level', path, mtime, level), image)
+        return image
+
+    def magnifiersource(self, path, level):
+        """Pyramid level of path converted once to RGB, so magnifier frames never convert modes"""
+        levelimage = self.pyramidlevel(path, level)
+        if levelimage.mode == 'RGB':
+            return levelimage
+        key = ('magnifier', path, os.stat(path).st_mtime_ns, level)
+        image = self.get(key)
+        if image is None:
+            image = displayready(levelimage)
+            self.put(key, image)
+        return image
+
+    def knownsizes(self):
+        """(path, mtime) -> full-resolution size for every image header read so far"""
+        with self.lock:
+            return dict(self.sizes)
+
+    def primesize(self, path, mtime, size):
+        """Record a full-resolution size known from elsewhere, such as a folder manifest"""
+        with self.lock:
+            self.sizes[(path, mtime)] = tuple(size)
+
+    def headersize(self, path):
+        """Full-resolution size of path, read from the file header without decoding pixels"""
+        key = (path, os.stat(path).st_mtime_ns)
+        with self.lock:
+            size = self.sizes.get(key)
+        if size is None:
+            with Image.open(path) as image:
+                size = image.size
+            with self.lock:
+                self.sizes[key] = size
+        return size
+
+    def rendition(self, path, canvassize, resample=Image.Resampling.LANCZOS, cachedonly=False):
+        """Canvas rendition of path, resampled from the pyramid level nearest the display scale
+
+        With cachedonly, returns None instead of building a missing rendition.
+        """
+        key = ('display', path, os.stat(path).st_mtime_ns, canvassize, resample)
+        image = self.get(key)
+        if image is None and not cachedonly:
+            scale, newwidth, newheight, _, _ = fitimage(self.headersize(path), canvassize)
+            source = self.pyramidlevel(path, pyramidlevelfor(scale))
+            image = source.resize((newwidth, newheight), resample)
+            self.put(key, image)
+        return image
+
+
+def prefetchmagnifiersource(cache, imagepath, preprocessedindex):
+    """Decode the RGB magnifier source (preprocessed if available) into the cache"""
+    preprocessedpath = preprocessedindex.find(imagepath) if preprocessedindex else None
+    cache.magnifiersource(preprocessedpath or imagepath, 0)
+
+
+class ImagePrefetcher:
+    """Decode neighbouring images on a worker pool so navigation hits the image cache
+
+    The canvas rendition and the magnifier source of an image are separate jobs, so showing an
+    image only ever waits for its rendition.
+    """
+
+    def __init__(self, cache, workers=2, ahead=2, behind=1):
+        self.cache = cache
+        self.ahead = ahead
+        self.behind = behind
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        # imagepath -> ((preprocessedindex, canvassize), rendition Future or None, magnifier source Future);
+        # only touched from the Tk thread
+        self.futures = {}
+
+    def schedule(self, currentpath, imagepaths, preprocessedindex, canvassize):
+        """Prefetch the current image's magnifier source and imagepaths (in priority order), cancel the rest
+
+        The current image's rendition is left to the viewer, which draws it and refines it itself.
+        """
+        params = (preprocessedindex, canvassize)
+        wanted = [currentpath] + imagepaths
+        for path in list(self.futures):
+            if path not in wanted or self.futures[path][0] != params:
+                _, rendition, source = self.futures.pop(path)
+                if rendition is not None:
+                    rendition.cancel()
+                source.cancel()
+        if currentpath not in self.futures:
+            source = self.executor.submit(prefetchmagnifiersource, self.cache, currentpath, preprocessedindex)
+            self.futures[currentpath] = (params, None, source)
+        # Renditions first: they decide how soon the next image appears
+        renditions = {}
+        for path in imagepaths:
+            if path not in self.futures:
+                renditions[path] = self.executor.submit(self.cache.rendition, path, canvassize)
+        for path, rendition in renditions.items():
+            source = self.executor.submit(prefetchmagnifiersource, self.cache, path, preprocessedindex)
+            self.futures[path] = (params, rendition, source)
+
+    def sourcepending(self, imagepath):
+        """Whether the magnifier source of imagepath is queued or decoding"""
+        entry = self.futures.get(imagepath)
+        return entry is not None and not entry[2].done()
+
+    def submit(self, fn, *args):
+        """Run fn on the worker pool outside the prefetch window"""
+        return self.executor.submit(fn, *args)
+
+    def wait(self, imagepath):
+        """Let an in-flight rendition prefetch of imagepath finish; a queued one is cancelled instead
+
+        The magnifier source keeps decoding in the background, as the canvas doesn't need it.
+        """
+        entry = self.futures.get(imagepath)
+        if entry is None or entry[1] is None:
+            return
+        params, future, source = entry
+        self.futures[imagepath] = (params, None, source)
+        if future.cancel():
+            return
+        try:
+            # Already resampling: waiting for it is never slower than starting over
+            future.result()
+        except Exception as e:
+            print(f"Prefetch failed for {imagepath}: {e}")
+
+    def clear(self):
+        for _, rendition, source in self.futures.values():
+            if rendition is not None:
+                rendition.cancel()
+            source.cancel()
+        self.futures.clear()
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FrameScheduler:
+    """Coalesce render requests to the latest arguments and cap the frame rate
+
+    Requests arriving while a frame is pending only replace its arguments, so a burst of motion
+    events renders once at the newest cursor position and stale positions are dropped.
+    """
+
+    def __init__(self, widget, render, fps=60):
+        self.widget = widget
+        self.render = render
+        self.interval = 1.0 / fps
+        self.latest = None
+        self.job = None
+        self.lastframe = 0.0
+        self.requests = 0
+        self.dropped = 0
+        self.frametimes = deque(maxlen=120)  # seconds spent rendering recent frames
+        self.framestarts = deque(maxlen=120)
+
+    def request(self, *args):
+        self.requests += 1
+        if self.latest is not None:
+            self.dropped += 1
+        self.latest = args
+        if self.job is None:
+            delay = max(0.0, self.interval - (time.perf_counter() - self.lastframe))
+            self.job = self.widget.after(int(delay * 1000), self.run)
+
+    def run(self):
+        self.job = None
+        args, self.latest = self.latest, None
+        if args is None:
+            return
+        start = time.perf_counter()
+        self.render(*args)
+        self.lastframe = start
+        self.framestarts.append(start)
+        self.frametimes.append(time.perf_counter() - start)
+
+    def cancel(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+        self.latest = None
+
+    def stats(self):
+        """Summary of recent frames: rate, render time and coalesced requests"""
+        if not self.frametimes:
+            return "No frames yet"
+        now = time.perf_counter()
+        recent = [start for start in self.framestarts if now - start <= 1.0]
+        average = 1000 * sum(self.frametimes) / len(self.frametimes)
+        worst = 1000 * max(self.frametimes)
+        return (f"{len(recent)} fps, {average:.1f} ms avg, {worst:.1f} ms max, "
+                f"{self.dropped}/{self.requests} coalesced")
+
+
+def generatethumbnail(imagepath, directory, size):
+    """Process-pool worker: create the cached thumbnail for imagepath if needed and return its path"""
+    stat = os.stat(imagepath)
+    key = f"{os.path.abspath(imagepath)}|{stat.st_mtime_ns}|{size}"
+    thumbpath = os.path.join(directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.jpg')
+    if not os.path.exists(thumbpath):
+        with Image.open(imagepath) as image:
+            image.draft('RGB', (size, size))
+            image.thumbnail((size, size), Image.Resampling.BILINEAR)
+            thumbnail = image.convert('RGB')
+        tmppath = f"{thumbpath}.{os.getpid()}.tmp"
+        thumbnail.save(tmppath, 'JPEG', quality=85)
+        os.replace(tmppath, thumbpath)
+    return thumbpath
+
+
+class Filmstrip(tk.Frame):
+    """Horizontal thumbnail strip of the filtered file list
+
+    Thumbnails are generated on a process pool and cached on disk by path and mtime. Only the
+    cells in view (plus a small margin) are drawn and requested, and they fill in as the workers
+    finish, so the Tk loop never waits on a decode.
+    """
+
+    def __init__(self, master, viewer, thumbnaildir, size=96):
+        super().__init__(master, bg='white')
+        self.viewer = viewer
+        self.thumbnaildir = thumbnaildir
+        self.size = size
+        self.cellwidth = size + 10
+        self.executor = None  # Started on first use
+        self.pending = {}  # imagepath -> Future
+        self.thumbpaths = {}  # imagepath -> cached thumbnail file (None if it failed)
+        self.photos = OrderedDict()  # imagepath -> PhotoImage, least recently shown first
+        self.maxphotos = 400
+        self.cellcount = None
+        self.redrawjob = None
+        self.polljob = None
+
+        self.scrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL)
+        self.scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.canvas = tk.Canvas(self, bg='#f0f0f0', height=size + 26, highlightthickness=0,
+                                xscrollcommand=self.onxscroll)
+        self.canvas.pack(fill=tk.X)
+        self.scrollbar.config(command=self.canvas.xview)
+        self.canvas.bind('<Configure>', lambda e: self.scheduleredraw())
+        self.canvas.bind('<Button-1>', self.onclick)
+        self.canvas.bind('<MouseWheel>', lambda e: self.canvas.xview_scroll(-1 if e.delta > 0 else 1, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self.canvas.xview_scroll(-1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.canvas.xview_scroll(1, 'units'))
+
+    def onxscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.scheduleredraw()
+
+    def scheduleredraw(self):
+        if self.redrawjob is None:
+            self.redrawjob = self.after_idle(self.redraw)
+
+    def refresh(self):
+        """The filtered list changed"""
+        self.cellcount = None
+        self.scheduleredraw()
+
+    def showcurrent(self):
+        """Scroll the current image into the middle of the strip"""
+        position = self.viewer.filteredposition(self.viewer.currentindex)
+        if position is not None:
+            total = max(1, len(self.viewer.filtered_indices) * self.cellwidth)
+            left = position * self.cellwidth - (self.canvas.winfo_width() - self.cellwidth) / 2
+            self.canvas.xview_moveto(max(0.0, left / total))
+        self.scheduleredraw()
+
+    def redraw(self):
+        self.redrawjob = None
+        indices = self.viewer.filtered_indices
+        if len(indices) != self.cellcount:
+            # Only touch the scroll region when it changes; it re-triggers onxscroll
+            self.cellcount = len(indices)
+            self.canvas.config(scrollregion=(0, 0, self.cellcount * self.cellwidth, self.size + 26))
+        self.canvas.delete('cell')
+        if not indices or not self.viewer.selectedfolder:
+            self.request([])
+            return
+
+        left = self.canvas.canvasx(0)
+        first = max(0, int(left // self.cellwidth) - 2)
+        last = min(len(indices), int((left + self.canvas.winfo_width()) // self.cellwidth) + 3)
+        visiblepaths = []
+        for position in range(first, last):
+            fileidx = indices[position]
+            filename = self.viewer.filenames[fileidx]
+            imagepath = os.path.join(self.viewer.selectedfolder, filename)
+            x = position * self.cellwidth + 5
+            centrex = x + self.size // 2
+            outline = 'red' if fileidx == self.viewer.currentindex else '#c0c0c0'
+            self.canvas.create_rectangle(x - 2, 3, x + self.size + 2, self.size + 7, outline=outline, width=2,
+                                         tags='cell')
+            photo = self.getphoto(imagepath)
+            if photo:
+                self.canvas.create_image(centrex, 5 + self.size // 2, image=photo, tags='cell')
+            else:
+                self.canvas.create_text(centrex, 5 + self.size // 2, text=str(fileidx + 1), fill='gray',
+                                        tags='cell')
+                visiblepaths.append(imagepath)
+            label = filename if len(filename) <= 16 else filename[:7] + '…' + filename[-8:]
+            self.canvas.create_text(centrex, self.size + 16, text=label, font=('Arial', 7), tags='cell')
+        self.request(visiblepaths)
+
+    def getphoto(self, imagepath):
+        photo = self.photos.get(imagepath)
+        if photo is not None:
+            self.photos.move_to_end(imagepath)
+            return photo
+        thumbpath = self.thumbpaths.get(imagepath)
+        if not thumbpath:
+            return None
+        try:
+            with Image.open(thumbpath) as thumbnail:
+                photo = ImageTk.PhotoImage(thumbnail)
+        except Exception as e:
+            print(f"Could not load thumbnail for {imagepath}: {e}")
+            self.thumbpaths[imagepath] = None
+            return None
+        self.photos[imagepath] = photo
+        while len(self.photos) > self.maxphotos:
+            self.photos.popitem(last=False)
+        return photo
+
+    def request(self, imagepaths):
+        """Generate thumbnails for imagepaths and drop queued work that scrolled out of view"""
+        for imagepath in list(self.pending):
+            if imagepath not in imagepaths and self.pending[imagepath].cancel():
+                del self.pending[imagepath]
+        missing = [path for path in imagepaths if path not in self.thumbpaths and path not in self.pending]
+        if not missing:
+            return
+        if self.executor is None:
+            try:
+                os.makedirs(self.thumbnaildir, exist_ok=True)
+            except OSError as e:
+                print(f"Thumbnails disabled: {e}")
+                for path in missing:
+                    self.thumbpaths[path] = None
+                return
+            # Spawn, not fork: forking would copy a Tk process whose worker threads may hold locks
+            self.executor = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                                mp_context=multiprocessing.get_context('spawn'))
+        for imagepath in missing:
+            self.pending[imagepath] = self.executor.submit(generatethumbnail, imagepath, self.thumbnaildir, self.size)
+        if self.polljob is None:
+            self.polljob = self.after(50, self.pollthumbnails)
+
+    def pollthumbnails(self):
+        self.polljob = None
+        finished = [path for path, future in self.pending.items() if future.done()]
+        for imagepath in finished:
+            future = self.pending.pop(imagepath)
+            try:
+                self.thumbpaths[imagepath] = future.result()
+            except Exception as e:
+                print(f"Could not create thumbnail for {imagepath}: {e}")
+                self.thumbpaths[imagepath] = None
+        if finished:
+            self.scheduleredraw()
+        if self.pending:
+            self.polljob = self.after(50, self.pollthumbnails)
+
+    def onclick(self, event):
+        position = int(self.canvas.canvasx(event.x) // self.cellwidth)
+        if 0 <= position < len(self.viewer.filtered_indices):
+            self.viewer.onfilmstripselect(self.viewer.filtered_indices[position])
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FileList(tk.Frame):
+    """Virtualized file list of the viewer's filtered files
+
+    Rows are drawn on a canvas straight from the viewer's filenames and filtered_indices, and only
+    the rows in view exist as canvas items, so the cost of a refresh doesn't grow with the folder.
+    Selection follows tk.Listbox: curselection, selection_set, see and a <<ListboxSelect>> event.
+    """
+
+    def __init__(self, master, viewer):
+        super().__init__(master, bg='white')
+        self.viewer = viewer
+        self.font = tkfont.Font(family='Arial', size=9)
+        self.rowheight = self.font.metrics('linespace') + 2
+        self.textwidth = 0  # Widest row drawn so far, for the horizontal scroll region
+        self.selected = None  # Selected row position
+        self.rowcount = None
+        self.redrawjob = None
+
+        self.xscrollbar = tk.Scrollbar(self, orient=tk.HORIZONTAL)
+        self.xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.yscrollbar = tk.Scrollbar(self, orient=tk.VERTICAL)
+        self.yscrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self, bg='white', highlightthickness=1, yscrollincrement=self.rowheight,
+                                xscrollcommand=self.xscrollbar.set, yscrollcommand=self.onyscroll)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.xscrollbar.config(command=self.canvas.xview)
+        self.yscrollbar.config(command=self.canvas.yview)
+        self.canvas.bind('<Configure>', self.onresize)
+        self.canvas.bind('<Button-1>', self.onclick)
+        self.canvas.bind('<Up>', lambda e: self.step(-1))
+        self.canvas.bind('<Down>', lambda e: self.step(1))
+        self.canvas.bind('<MouseWheel>', lambda e: self.canvas.yview_scroll(-3 if e.delta > 0 else 3, 'units'))
+        self.canvas.bind('<Button-4>', lambda e: self.canvas.yview_scroll(-3, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.canvas.yview_scroll(3, 'units'))
+
+    def onyscroll(self, first, last):
+        self.yscrollbar.set(first, last)
+        self.scheduleredraw()
+
+    def onresize(self, event):
+        # The scroll region spans at least the canvas width so selected rows highlight edge to edge
+        self.rowcount = None
+        self.scheduleredraw()
+
+    def scheduleredraw(self):
+        if self.redrawjob is None:
+            self.redrawjob = self.after_idle(self.redraw)
+
+    def refresh(self):
+        """The filtered list or the annotation status changed"""
+        self.scheduleredraw()
+
+    def updatescrollregion(self):
+        width = max(self.textwidth + 4, self.canvas.winfo_width())
+        self.canvas.config(scrollregion=(0, 0, width, self.rowcount * self.rowheight))
+
+    def syncrowcount(self):
+        # Only touch the scroll region when it changes; it re-triggers onyscroll
+        if len(self.viewer.filtered_indices) != self.rowcount:
+            self.rowcount = len(self.viewer.filtered_indices)
+            self.updatescrollregion()
+
+    def redraw(self):
+        self.redrawjob = None
+        viewer = self.viewer
+        indices = viewer.filtered_indices
+        self.syncrowcount()
+        self.canvas.delete('row')
+
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.rowheight))
+        last = min(len(indices), int((top + self.canvas.winfo_height()) // self.rowheight) + 1)
+        width = max(self.textwidth + 4, self.canvas.winfo_width())
+        textwidth = self.textwidth
+        for position in range(first, last):
+            file_idx = indices[position]
+            file = viewer.filenames[file_idx]
+            has_annotation = viewer.annotationindex is not None and viewer.annotationindex.has(file)
+            # Serial number (original index) and marker if annotated
+            checkmark = "✓" if has_annotation else " "
+            display_text = f"{file_idx + 1:3d}. {checkmark} {file}"
+            y = position * self.rowheight
+            if position == self.selected:
+                self.canvas.create_rectangle(0, y, width, y + self.rowheight, fill='#c0d8f0', outline='',
+                                             tags='row')
+                color = 'darkgreen' if has_annotation else 'black'
+            else:
+                color = 'green' if has_annotation else 'black'
+            self.canvas.create_text(2, y + 1, anchor=tk.NW, text=display_text, font=self.font, fill=color,
+                                    tags='row')
+            textwidth = max(textwidth, self.font.measure(display_text))
+        if textwidth > self.textwidth:
+            self.textwidth = textwidth
+            self.updatescrollregion()
+
+    def curselection(self):
+        return () if self.selected is None else (self.selected,)
+
+    def selection_clear(self):
+        if self.selected is not None:
+            self.selected = None
+            self.scheduleredraw()
+
+    def selection_set(self, position):
+        if position != self.selected:
+            self.selected = position
+            self.scheduleredraw()
+
+    def see(self, position):
+        """Scroll so the row at position is in view"""
+        self.syncrowcount()
+        if not self.rowcount:
+            return
+        top = self.canvas.canvasy(0)
+        height = self.canvas.winfo_height()
+        y = position * self.rowheight
+        if y < top:
+            self.canvas.yview_moveto(y / (self.rowcount * self.rowheight))
+        elif y + self.rowheight > top + height:
+            self.canvas.yview_moveto((y + self.rowheight - height) / (self.rowcount * self.rowheight))
+
+    def choose(self, position):
+        """Select the row at position as if the user picked it"""
+        if 0 <= position < len(self.viewer.filtered_indices):
+            self.selection_set(position)
+            self.see(position)
+            self.event_generate('<<ListboxSelect>>')
+
+    def onclick(self, event):
+        self.canvas.focus_set()
+        self.choose(int(self.canvas.canvasy(event.y) // self.rowheight))
+
+    def step(self, delta):
+        if self.selected is not None:
+            self.choose(self.selected + delta)
+        return 'break'
+
+
 class ImageViewer(tk.Tk):
-    def __init__(self):
+    def __init__(self, diskcachedir=None, diskcachelimit=4 * 1024 * 1024 * 1024, renderquality='progressive',
+                 thumbnaildir=DEFAULTTHUMBNAILDIR, memorycachelimit=1024 * 1024 * 1024):
         super().__init__()
         self.title("Joly AI Image Annotator")
         self.geometry("1600x900")
         self.configure(bg='white')
 
         # UI Elements
-        self.filelistbox = None
+        self.filelist = None
+        self.filmstrip = None
+        self.thumbnaildir = thumbnaildir
         self.filenamelabel = None
         self.imagecanvas = None
         self.magnifiercanvas = None
         self.magnifierlabel = None
         self.selectedfolder = None
+        self.annotationindex = None
         self.preprocessedfolder = None  # NEW: Folder for preprocessed images
+        self.preprocessedindex = None
         self.currentimage = None
         self.currentindex = -1
-        self.originalimage = None
-        self.preprocessedimage = None  # NEW: Store preprocessed image
+        self.originalpath = None
+        self.originalstat = None  # (st_size, st_mtime_ns) of originalpath when it was displayed
+        self.originalsize = None
+        self.preprocessedpath = None  # NEW: Matching preprocessed image, if any
+        # Magnifier source pyramid levels, decoded on first use
+        self.magnifierlevels = {}
+        self.magnifiersourcesize = None
+        # (key, source, ax, bx, ay, by, regionwidth, regionheight) mapping canvas to source coordinates
+        self.magnifiertransform = None
+        # Rendered magnifier patches of the current image, keyed by quantized source position
+        self.tilecache = ImageCache(budget=32 * 1024 * 1024)
+        self.magnifierquantum = 1.0  # Tile grid step in source pixels
+        self.canvasimageid = None
+        self.canvassize = None
         self.displayscale = 1.0
         self.imageoffsetx = 0
         self.imageoffsety = 0
@@ -76,15 +1452,26 @@ class ImageViewer(tk.Tk):
         self.filenames = []
         # Store indices of files matching current search filter
         self.filtered_indices = []
+        self.filteredpositions = {}  # File index -> position in filtered_indices
+        self.searchindex = FilenameSearchIndex()
+        self.searchjob = None  # Pending debounced search
+        self.searchstreamjob = None  # Next batch of results being streamed into the list
+        self.searchdelay = 200  # ms of typing pause before a search runs
+        self.searchbatch = 500  # Results added to the list per streamed batch
 
         # Magnifier settings - will be dynamically updated
         self.magnifierzoom = 3.0
         self.magnifiersize = 300  # Initial size, will be updated dynamically
-        self.magnifiedimage = None
+        self.magnifiedimage = None  # Persistent photo buffer of magnifiersize, updated with paste
+        self.magnifierimageid = None
+        self.crosshairids = ()
+        self.overlayitems = []  # Reusable (outline, label background, label text) canvas items
+        self.magnifierfps = 60  # Frame-rate cap for magnifier updates
         self.rightpane = None  # Store reference to right pane
 
         # Bounding box management
         self.boundingboxes = []
+        self.boxindex = BoxIndex()  # Spatial index over boundingboxes for hit-testing
         self.drawingbox = False
         self.startx = 0
         self.starty = 0
@@ -98,6 +1485,49 @@ class ImageViewer(tk.Tk):
         self.contextmenu = None
 
         self.imageextensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.ppm', '.pgm', '.pbm')
+
+        # Folder scans run on a worker and stream batches of files into the list
+        self.scanexecutor = ThreadPoolExecutor(max_workers=1)
+        self.scanfuture = None
+        self.scancancel = None  # threading.Event that stops the running scan
+        self.scanbatches = deque()
+        self.scanjob = None
+        self.recursivevar = tk.BooleanVar(value=False)
+        # Polling for files added, removed or renamed after the scan
+        self.watcher = None
+        self.watchfuture = None
+        self.watchjob = None
+        self.watchinterval = 3000  # ms between folder polls
+        # Metadata persisted next to the images, and the per-class box counts of each sidecar
+        self.manifest = None
+        self.annotationcounts = {}  # AnnotationIndex.key(filename) -> {'sidecar', 'mtime', 'counts'}
+        self.storedcounts = {}  # Manifest counts not yet checked against their sidecar's mtime
+        self.countfuture = None  # Background read of sidecars that have no counts yet
+        self.countjob = None
+        self.countagain = False  # Sidecars appeared while a count was running
+
+        # Optional decoded-pixel cache on disk, kept across sessions
+        self.diskcache = None
+        if diskcachedir:
+            try:
+                self.diskcache = DiskPixelCache(diskcachedir, limit=diskcachelimit)
+            except OSError as e:
+                print(f"Disk cache disabled: {e}")
+        # Decoded images and canvas renditions, kept across navigation (budget in bytes)
+        self.imagecache = ImageCache(budget=memorycachelimit, diskcache=self.diskcache)
+        # 'progressive' draws a quick preview and swaps in LANCZOS when ready, 'quality' waits for
+        # LANCZOS, 'fast' keeps the preview
+        self.renderquality = renderquality
+        self.previewresample = Image.Resampling.BOX
+        self.refinejob = None
+        self.resizejob = None
+        # Background decoding of the next/previous images in the filtered list
+        self.prefetcher = ImagePrefetcher(self.imagecache, workers=2, ahead=2, behind=1)
+
+        self.magnifierscheduler = FrameScheduler(self, self.rendermagnifier, fps=self.magnifierfps)
+        self.magnifierpoll = None  # Pending check for the current image's magnifier source prefetch
+        self.magnifierwaiting = None  # Latest cursor position seen while that prefetch was running
+
         self.createtopnavbar()
         self.createcontainerframe()
         self.createcontextmenu()
@@ -106,14 +1536,30 @@ class ImageViewer(tk.Tk):
 
         # Bind resize event to update magnifier size
         self.bind('<Configure>', self.onwindowresize)
+        self.protocol("WM_DELETE_WINDOW", self.onclose)
+
+    def onclose(self):
+        """Stop background workers and close the window"""
+        self.abandonscan()
+        self.scanexecutor.shutdown(wait=False)
+        self.prefetcher.shutdown()
+        self.filmstrip.shutdown()
+        if self.diskcache:
+            self.diskcache.shutdown()
+        print(f"Image cache: {self.imagecache.stats()}")
+        print(f"Magnifier tiles: {self.tilecache.stats()}")
+        self.destroy()
 
     def createtopnavbar(self):
         buttonframe = tk.Frame(self, bg='white')
         buttonframe.pack(side=tk.TOP, fill='x', anchor='w', pady=5)
 
         btnselect = tk.Button(buttonframe, text="Select Original Folder", command=self.selectfolder)
+        chkrecursive = tk.Checkbutton(buttonframe, text="Include Subfolders", variable=self.recursivevar, bg='white')
         btnpreprocessed = tk.Button(buttonframe, text="Select Preprocessed Folder",
                                     command=self.selectpreprocessedfolder, bg='#ffe6cc')  # NEW
+        btnmissing = tk.Button(buttonframe, text="Missing Preprocessed", command=self.showmissingpreprocessed,
+                               bg='#ffe6cc')
         btnright = tk.Button(buttonframe, text="Next >", command=self.nextimage)
         btnleft = tk.Button(buttonframe, text="< Previous", command=self.previousimage)
 
@@ -129,7 +1575,9 @@ class ImageViewer(tk.Tk):
 
         btnsave.pack(side=tk.LEFT, padx=5, pady=5)
         btnselect.pack(side=tk.LEFT, padx=5, pady=5)
+        chkrecursive.pack(side=tk.LEFT, padx=(0, 5), pady=5)
         btnpreprocessed.pack(side=tk.LEFT, padx=5, pady=5)  # NEW
+        btnmissing.pack(side=tk.LEFT, padx=5, pady=5)
         btnclearboxes.pack(side=tk.LEFT, padx=5, pady=5)
         btndeleteselected.pack(side=tk.LEFT, padx=5, pady=5)
         btnzoomin.pack(side=tk.LEFT, padx=3, pady=5)
@@ -156,6 +1604,15 @@ class ImageViewer(tk.Tk):
         leftpane.place(relx=0, rely=0, relwidth=0.10, relheight=1)
         tk.Label(leftpane, text="Files", bg='white', font=('Arial', 10, 'bold')).pack(padx=5, pady=(10, 5))
 
+        # Folder scan progress
+        scanframe = tk.Frame(leftpane, bg='white')
+        scanframe.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.cancelscanbtn = tk.Button(scanframe, text="Cancel", command=self.cancelscan, font=('Arial', 8),
+                                       state=tk.DISABLED)
+        self.cancelscanbtn.pack(side=tk.RIGHT)
+        self.scanlabel = tk.Label(scanframe, text="", bg='white', fg='gray', font=('Arial', 8), anchor='w')
+        self.scanlabel.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
         # Search frame
         searchframe = tk.Frame(leftpane, bg='white')
         searchframe.pack(fill=tk.X, padx=5, pady=(0, 5))
@@ -171,20 +1628,33 @@ class ImageViewer(tk.Tk):
                                         font=('Arial', 8), width=2, relief=tk.FLAT)
         self.clearsearchbtn.pack(side=tk.RIGHT)
 
-        # Create frame for listbox and scrollbar
-        listframe = tk.Frame(leftpane, bg='white')
-        listframe.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-        # Add scrollbar
-        scrollbar = tk.Scrollbar(listframe, orient=tk.HORIZONTAL)
-        scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
-
-        # Create listbox with scrollbar
-        self.filelistbox = tk.Listbox(listframe, bg='white', font=('Arial', 9),
-                                      xscrollcommand=scrollbar.set)
-        self.filelistbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.filelistbox.xview)
-        self.filelistbox.bind('<<ListboxSelect>>', self.onfileselect)
+        # Annotation status and class filters, combined with the search text
+        self.statusfilters = ("All files", "Annotated", "Unannotated", "Empty saves")
+        self.classfilters = {"Any class": None}
+        self.classfilters.update((name, key) for key, name in BoundingBox.CLASSIFICATIONS.items())
+        statusframe = tk.Frame(leftpane, bg='white')
+        statusframe.pack(fill=tk.X, padx=5)
+        self.statusvar = tk.StringVar(value=self.statusfilters[0])
+        statusmenu = tk.OptionMenu(statusframe, self.statusvar, *self.statusfilters)
+        statusmenu.config(font=('Arial', 8), bg='white', highlightthickness=0)
+        statusmenu.pack(fill=tk.X)
+        classframe = tk.Frame(leftpane, bg='white')
+        classframe.pack(fill=tk.X, padx=5, pady=(0, 5))
+        self.classvar = tk.StringVar(value="Any class")
+        classmenu = tk.OptionMenu(classframe, self.classvar, *self.classfilters)
+        classmenu.config(font=('Arial', 8), bg='white', highlightthickness=0)
+        classmenu.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.classminvar = tk.StringVar(value="1")
+        tk.Spinbox(classframe, from_=1, to=9999, textvariable=self.classminvar, width=4,
+                   font=('Arial', 8)).pack(side=tk.RIGHT)
+        tk.Label(classframe, text="≥", bg='white', font=('Arial', 8)).pack(side=tk.RIGHT)
+        for variable in (self.statusvar, self.classvar, self.classminvar):
+            variable.trace('w', self.onsearchchange)
+
+        # Virtualized file list; only the rows in view are drawn
+        self.filelist = FileList(leftpane, self)
+        self.filelist.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.filelist.bind('<<ListboxSelect>>', self.onfileselect)
 
         # Middle pane: 70% image display
         middlepane = tk.Frame(container, bg='white')
@@ -192,6 +1662,10 @@ class ImageViewer(tk.Tk):
         self.filenamelabel = tk.Label(middlepane, text="Select an image to view", font=('Arial', 12), bg='white')
         self.filenamelabel.pack(padx=10, pady=10)
 
+        # Thumbnail strip along the bottom; packed before the canvas so it keeps its height
+        self.filmstrip = Filmstrip(middlepane, self, self.thumbnaildir)
+        self.filmstrip.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
+
         self.imagecanvas = tk.Canvas(middlepane, bg='white', highlightthickness=0)
         self.imagecanvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
@@ -208,6 +1682,7 @@ class ImageViewer(tk.Tk):
         self.magnifiercanvas = tk.Canvas(self.rightpane, bg='white', width=self.magnifiersize,
                                          height=self.magnifiersize)
         self.magnifiercanvas.pack(pady=5, padx=10)
+        self.createmagnifieritems()
 
         self.magnifierlabel = tk.Label(self.rightpane, text="Move cursor over image", font=('Arial', 10),
                                        bg='lightgray')
@@ -222,6 +1697,10 @@ class ImageViewer(tk.Tk):
                                           bg='lightgray', fg='gray')
         self.preprocessedlabel.pack(pady=5)
 
+        self.framestatslabel = tk.Label(self.rightpane, text="", font=('Arial', 8), bg='lightgray', fg='gray')
+        self.framestatslabel.pack()
+        self.after(1000, self.updateframestats)
+
         # Annotation list in right pane
         tk.Label(self.rightpane, text="Annotations", font=('Arial', 12, 'bold'), bg='lightgray').pack(pady=(15, 5))
         self.annotationlistbox = tk.Listbox(self.rightpane, bg='white', height=10, font=('Arial', 10))
@@ -230,10 +1709,48 @@ class ImageViewer(tk.Tk):
         self.annotationlistbox.bind('<Button-3>', self.showcontextmenuforlist)
 
     def onwindowresize(self, event):
-        """Handle window resize to update magnifier size dynamically"""
+        """Handle window resize: re-layout once the window has stopped changing size"""
         if self.rightpane and event.widget == self:
-            # Calculate new magnifier size based on right pane width
-            self.after(100, self.updatemagnifiersize)
+            if self.resizejob:
+                self.after_cancel(self.resizejob)
+            self.resizejob = self.after(150, self.applywindowresize)
+
+    def applywindowresize(self):
+        """Debounced resize: update the magnifier size and re-layout the main canvas"""
+        self.resizejob = None
+        self.updatemagnifiersize()
+        self.relayoutcanvas()
+
+    def currentview(self):
+        """View transform from original-image to canvas coordinates"""
+        return self.displayscale, self.imageoffsetx, self.imageoffsety
+
+    def canvastoimage(self, canvasx, canvasy):
+        return (canvasx - self.imageoffsetx) / self.displayscale, (canvasy - self.imageoffsety) / self.displayscale
+
+    def projectboxes(self, boxes):
+        """Canvas coordinates of boxes under the current view, in one pass"""
+        view = self.currentview()
+        return [bbox.canvas_coords(view) for bbox in boxes]
+
+    def relayoutcanvas(self):
+        """Fit the current image to the new canvas size from cached pixels and reproject the boxes"""
+        if not self.originalsize or self.drawingbox:
+            return
+        canvassize = self.getcanvassize()
+        if canvassize == self.canvassize:
+            return
+        try:
+            self.displayscale, _, _, self.imageoffsetx, self.imageoffsety = fitimage(self.originalsize, canvassize)
+            self.drawrendition(self.originalpath, canvassize)
+        except Exception as e:
+            print(f"Could not re-layout image: {e}")
+            return
+        # Boxes live in image space, so only their canvas projection changes
+        for bbox, coords in zip(self.boundingboxes, self.projectboxes(self.boundingboxes)):
+            self.imagecanvas.coords(bbox.canvasid, *coords)
+        # Neighbours were prefetched for the old canvas size
+        self.prefetchneighbours()
 
     def updatemagnifiersize(self):
         """Update magnifier canvas size based on right pane width"""
@@ -245,9 +1762,64 @@ class ImageViewer(tk.Tk):
             if newsize != self.magnifiersize:
                 self.magnifiersize = newsize
                 self.magnifiercanvas.config(width=self.magnifiersize, height=self.magnifiersize)
+                self.createmagnifieritems()
         except:
             pass
 
+    def createmagnifieritems(self):
+        """(Re)allocate the magnifier photo buffer and its canvas items for the current magnifiersize"""
+        self.magnifiercanvas.delete('all')
+        self.overlayitems = []
+        self.magnifiedimage = ImageTk.PhotoImage('RGB', (self.magnifiersize, self.magnifiersize))
+        self.magnifierimageid = self.magnifiercanvas.create_image(0, 0, anchor=tk.NW, image=self.magnifiedimage)
+
+        # Crosshair
+        center = self.magnifiersize // 2
+        self.crosshairids = (
+            self.magnifiercanvas.create_line(center - 15, center, center + 15, center, fill='red', width=2,
+                                             tags='crosshair'),
+            self.magnifiercanvas.create_line(center, center - 15, center, center + 15, fill='red', width=2,
+                                             tags='crosshair'),
+        )
+
+    def updatemagnifieroverlays(self, boxes, magnifiercoords):
+        """Show box outlines and class labels as canvas items above the magnifier pixels"""
+        canvas = self.magnifiercanvas
+        while len(self.overlayitems) < len(boxes):
+            self.overlayitems.append((
+                canvas.create_rectangle(0, 0, 0, 0, state='hidden'),
+                canvas.create_rectangle(0, 0, 0, 0, width=0, state='hidden'),
+                canvas.create_text(0, 0, anchor=tk.NW, fill='black', font=('Arial', 8), state='hidden'),
+            ))
+            canvas.tag_raise('crosshair')
+
+        for (outlineid, labelbgid, labelid), bbox, (magx1, magy1, magx2, magy2) in zip(self.overlayitems, boxes,
+                                                                                     magnifiercoords):
+            # Get color for the bounding box
+            color = bbox.get_color() if bbox.classification else 'blue'
+            if bbox.selected:
+                color = 'green'
+
+            # Thicker line for visibility
+            linewidth = 3 if bbox.selected else 2
+            canvas.coords(outlineid, magx1, magy1, magx2, magy2)
+            canvas.itemconfig(outlineid, outline=color, width=linewidth, state='normal')
+
+            # Classification label, above the box or inside it near the top edge
+            if bbox.classification:
+                labely = magy1 - 15 if magy1 > 15 else magy1 + 2
+                canvas.coords(labelid, magx1, labely)
+                canvas.itemconfig(labelid, text=bbox.classification, state='normal')
+                canvas.coords(labelbgid, magx1 - 2, labely - 2, magx1 + 10, labely + 14)
+                canvas.itemconfig(labelbgid, fill=color, state='normal')
+            else:
+                canvas.itemconfig(labelid, state='hidden')
+                canvas.itemconfig(labelbgid, state='hidden')
+
+        for items in self.overlayitems[len(boxes):]:
+            for itemid in items:
+                canvas.itemconfig(itemid, state='hidden')
+
     def bindcanvasevents(self):
         """Bind mouse events for bounding box functionality"""
         self.imagecanvas.bind('<Button-1>', self.oncanvasclick)
@@ -260,6 +1832,11 @@ class ImageViewer(tk.Tk):
         """Bind keyboard events for arrow key navigation"""
         self.bind('<Left>', lambda e: self.previousimage())
         self.bind('<Right>', lambda e: self.nextimage())
+        # Home and End also move the cursor in the search and count fields, which must not navigate
+        self.bind('<Home>', lambda e: None if self.intextfield(e) else self.firstimage())
+        self.bind('<End>', lambda e: None if self.intextfield(e) else self.lastimage())
+        self.bind('<Control-g>', lambda e: None if self.intextfield(e) else self.jumptoimage())
+        self.bind('<Control-G>', lambda e: None if self.intextfield(e) else self.jumptoimage())
         self.bind('<Delete>', lambda e: self.deleteselectedbox())
         self.bind('<BackSpace>', lambda e: self.deleteselectedbox())
 
@@ -287,121 +1864,148 @@ class ImageViewer(tk.Tk):
         self.bind('O', lambda e: self.classifybox('O'))
         self.focus_set()
 
+    @staticmethod
+    def intextfield(event):
+        """Whether a key event was typed into an Entry or Spinbox"""
+        return isinstance(event.widget, (tk.Entry, tk.Spinbox))
+
     def onmousemove(self, event):
-        """Handle mouse movement to update magnifier with preprocessed image and bounding boxes"""
-        if not self.originalimage:
+        """Handle mouse movement: queue a magnifier frame at the latest cursor position"""
+        self.magnifierscheduler.request(event.x, event.y)
+
+    def updateframestats(self):
+        """Refresh the magnifier frame-time readout once a second"""
+        self.framestatslabel.config(text=f"Magnifier: {self.magnifierscheduler.stats()}")
+        self.after(1000, self.updateframestats)
+
+    def rendermagnifier(self, canvasx, canvasy):
+        """Update magnifier with preprocessed image and bounding boxes"""
+        if not self.originalsize:
             return
-        canvasx, canvasy = event.x, event.y
 
-        origx = (canvasx - self.imageoffsetx) / self.displayscale
-        origy = (canvasy - self.imageoffsety) / self.displayscale
+        origx, origy = self.canvastoimage(canvasx, canvasy)
 
-        imgwidth, imgheight = self.originalimage.size
+        imgwidth, imgheight = self.originalsize
         if origx < 0 or origx > imgwidth or origy < 0 or origy > imgheight:
             self.magnifierlabel.config(text="Cursor outside image")
             return
 
+        if not self.magnifierlevels and self.prefetcher.sourcepending(self.originalpath):
+            # A worker is decoding the magnifier source; decoding it here too would stall the UI
+            self.magnifierwaiting = (canvasx, canvasy)
+            self.magnifierlabel.config(text="Loading magnifier...")
+            if self.magnifierpoll is None:
+                self.magnifierpoll = self.after(20, self.pollmagnifiersource)
+            return
+
         try:
             # NEW: Use preprocessed image if available, otherwise use original
-            magnifiersource = self.preprocessedimage if self.preprocessedimage else self.originalimage
-            sourcewidth, sourceheight = magnifiersource.size
-
-            # Calculate scale factor if preprocessed image has different dimensions
-            scalex = sourcewidth / imgwidth
-            scaley = sourceheight / imgheight
-
-            # Adjust coordinates for preprocessed image
-            adjorigx = origx * scalex
-            adjorigy = origy * scaley
+            magnifiersource, ax, bx, ay, by, regionwidth, regionheight = self.getmagnifiertransform()
 
+            # Snap to the tile grid so repeat hovers over the same spot reuse a rendered patch
+            quantum = self.magnifierquantum
+            sourcex = round((canvasx * ax + bx) / quantum) * quantum
+            sourcey = round((canvasy * ay + by) / quantum) * quantum
+            origx, origy = self.canvastoimage((sourcex - bx) / ax, (sourcey - by) / ay)
             cropsize = self.magnifiersize / self.magnifierzoom
-            # Adjust crop size for preprocessed image scale
-            adjcropsize = cropsize * scalex  # Assuming uniform scaling
-
-            left = adjorigx - adjcropsize / 2
-            top = adjorigy - adjcropsize / 2
-            right = adjorigx + adjcropsize / 2
-            bottom = adjorigy + adjcropsize / 2
 
-            # Calculate the actual crop boundaries (clamped to image)
-            cropleft = max(0, int(left))
-            croptop = max(0, int(top))
-            cropright = min(sourcewidth, int(right))
-            cropbottom = min(sourceheight, int(bottom))
-
-            cropped = magnifiersource.crop((cropleft, croptop, cropright, cropbottom))
-            magnified = cropped.resize((self.magnifiersize, self.magnifiersize), Image.Resampling.NEAREST)
-
-            # Convert to drawable image to add bounding boxes
-            magnifieddraw = magnified.copy()
-            draw = ImageDraw.Draw(magnifieddraw)
-
-            # Draw bounding boxes that are visible in the magnified area
+            tilekey = (self.preprocessedpath or self.originalpath, magnifiersource.size, sourcex, sourcey,
+                       self.magnifierzoom, self.magnifiersize)
+            magnified = self.tilecache.get(tilekey)
+            if magnified is None:
+                # One-shot resample of the region into a magnifier-sized image. Parts of the region
+                # beyond the image edge are padded instead of clamping the crop, which would stretch
+                # a non-square crop to the square magnifier near the border.
+                region = (sourcex - regionwidth / 2, sourcey - regionheight / 2,
+                          sourcex + regionwidth / 2, sourcey + regionheight / 2)
+                magnified = magnifiersource.transform((self.magnifiersize, self.magnifiersize),
+                                                      Image.Transform.EXTENT, region, Image.Resampling.NEAREST)
+                self.tilecache.put(tilekey, magnified)
+
+            # Bounding boxes that are visible in the magnified area
             # Use original image coordinates for bounding boxes
             origleft = origx - cropsize / 2
             origtop = origy - cropsize / 2
             origright = origx + cropsize / 2
             origbottom = origy + cropsize / 2
 
-            for bbox in self.boundingboxes:
-                # Convert canvas coordinates to original image coordinates
-                bboxorigx1 = (bbox.x1 - self.imageoffsetx) / self.displayscale
-                bboxorigy1 = (bbox.y1 - self.imageoffsety) / self.displayscale
-                bboxorigx2 = (bbox.x2 - self.imageoffsetx) / self.displayscale
-                bboxorigy2 = (bbox.y2 - self.imageoffsety) / self.displayscale
-
-                # Check if bbox intersects with the visible magnifier area (using original coords)
-                if (bboxorigx2 >= origleft and bboxorigx1 <= origright and
-                        bboxorigy2 >= origtop and bboxorigy1 <= origbottom):
-
-                    # Convert to magnifier coordinates
-                    magx1 = (bboxorigx1 - origleft) * self.magnifierzoom
-                    magy1 = (bboxorigy1 - origtop) * self.magnifierzoom
-                    magx2 = (bboxorigx2 - origleft) * self.magnifierzoom
-                    magy2 = (bboxorigy2 - origtop) * self.magnifierzoom
-
-                    # Clamp to magnifier bounds
-                    magx1 = max(0, min(self.magnifiersize, magx1))
-                    magy1 = max(0, min(self.magnifiersize, magy1))
-                    magx2 = max(0, min(self.magnifiersize, magx2))
-                    magy2 = max(0, min(self.magnifiersize, magy2))
-
-                    # Get color for the bounding box
-                    color = bbox.get_color() if bbox.classification else 'blue'
-                    if bbox.selected:
-                        color = 'green'
-
-                    # Draw the rectangle with thicker line for visibility
-                    linewidth = 3 if bbox.selected else 2
-                    draw.rectangle([magx1, magy1, magx2, magy2], outline=color, width=linewidth)
-
-                    # Draw classification label if classified
-                    if bbox.classification:
-                        labeltext = bbox.classification
-                        # Draw label background
-                        textbbox = draw.textbbox((magx1, magy1 - 15), labeltext)
-                        if magy1 > 15:  # Label above box
-                            draw.rectangle([textbbox[0] - 2, textbbox[1] - 2, textbbox[2] + 2, textbbox[3] + 2],
-                                           fill=color)
-                            draw.text((magx1, magy1 - 15), labeltext, fill='black')
-                        else:  # Label inside box
-                            draw.rectangle([textbbox[0] - 2, magy1 + 2, textbbox[2] + 2, magy1 + 17], fill=color)
-                            draw.text((magx1, magy1 + 2), labeltext, fill='black')
-
-            self.magnifiedimage = ImageTk.PhotoImage(magnifieddraw)
-
-            self.magnifiercanvas.delete('all')
-            self.magnifiercanvas.create_image(0, 0, anchor=tk.NW, image=self.magnifiedimage)
-
-            # Draw crosshair
-            center = self.magnifiersize // 2
-            self.magnifiercanvas.create_line(center - 15, center, center + 15, center, fill='red', width=2)
-            self.magnifiercanvas.create_line(center, center - 15, center, center + 15, fill='red', width=2)
+            # Only the boxes in the grid cells under the magnified area need checking; boxes are
+            # already in original image coordinates, so one pass maps them to magnifier coordinates
+            visibleboxes = self.boxindex.intersecting(origleft, origtop, origright, origbottom)
+            zoom = self.magnifierzoom
+            size = self.magnifiersize
+            magnifiercoords = [(max(0, min(size, (bbox.x1 - origleft) * zoom)),
+                                max(0, min(size, (bbox.y1 - origtop) * zoom)),
+                                max(0, min(size, (bbox.x2 - origleft) * zoom)),
+                                max(0, min(size, (bbox.y2 - origtop) * zoom))) for bbox in visibleboxes]
+
+            # Pixels go into the persistent photo; boxes and labels are vector items layered above it
+            self.magnifiedimage.paste(magnified)
+            self.updatemagnifieroverlays(visibleboxes, magnifiercoords)
 
             self.magnifierlabel.config(text=f"Position: ({int(origx)}, {int(origy)})")
         except Exception as e:
             print(f"Magnifier error: {e}")
 
+    def getmagnifiersourcesize(self):
+        """Full-resolution size of the magnifier source (preprocessed if available)"""
+        if self.magnifiersourcesize is None:
+            if self.preprocessedpath:
+                try:
+                    self.magnifiersourcesize = self.imagecache.headersize(self.preprocessedpath)
+                    return self.magnifiersourcesize
+                except Exception as e:
+                    print(f"Error loading preprocessed image: {e}")
+                    self.preprocessedpath = None
+            self.magnifiersourcesize = self.originalsize
+        return self.magnifiersourcesize
+
+    def getmagnifiersource(self, level=0):
+        """RGB magnifier source pyramid level (preprocessed if available), prepared on first use"""
+        if level not in self.magnifierlevels:
+            try:
+                self.magnifierlevels[level] = self.imagecache.magnifiersource(
+                    self.preprocessedpath or self.originalpath, level)
+            except Exception:
+                if not self.preprocessedpath:
+                    raise
+                # Fall back to the original on the next event
+                self.preprocessedpath = None
+                self.magnifierlevels = {}
+                self.magnifiersourcesize = None
+                self.magnifiertransform = None
+                raise
+        return self.magnifierlevels[level]
+
+    def getmagnifiertransform(self):
+        """Magnifier source and the linear map from canvas to source coordinates
+
+        Recomputed only when the image, view, zoom or magnifier size changes, so a frame only
+        has to evaluate the map and resample.
+        """
+        key = (self.originalpath, self.preprocessedpath, self.currentview(), self.magnifierzoom, self.magnifiersize)
+        if self.magnifiertransform is None or self.magnifiertransform[0] != key:
+            imgwidth, imgheight = self.originalsize
+            sourcewidth, sourceheight = self.getmagnifiersourcesize()
+
+            # Calculate scale factor if preprocessed image has different dimensions
+            scalex = sourcewidth / imgwidth
+            scaley = sourceheight / imgheight
+
+            cropsize = self.magnifiersize / self.magnifierzoom
+            # Use the coarsest pyramid level that still has a source pixel per magnifier pixel
+            magnifiersource = self.getmagnifiersource(pyramidlevelfor(self.magnifiersize / (cropsize * scalex)))
+
+            # Original image -> preprocessed image -> pyramid level
+            factorx = scalex * magnifiersource.width / sourcewidth
+            factory = scaley * magnifiersource.height / sourceheight
+            # Canvas -> original image is (canvas - offset) / displayscale
+            ax = factorx / self.displayscale
+            ay = factory / self.displayscale
+            self.magnifiertransform = (key, magnifiersource, ax, -self.imageoffsetx * ax, ay,
+                                       -self.imageoffsety * ay, cropsize * factorx, cropsize * factory)
+        return self.magnifiertransform[1:]
+
     def increasemagnifierzoom(self):
         """Increase magnifier zoom factor"""
         self.magnifierzoom = min(10.0, self.magnifierzoom + 0.5)
@@ -425,6 +2029,11 @@ class ImageViewer(tk.Tk):
         """NEW: Select folder containing preprocessed images"""
         folderselected = filedialog.askdirectory(title="Select Preprocessed Images Folder")
         if folderselected:
+            try:
+                self.preprocessedindex = PreprocessedIndex(folderselected, self.imageextensions)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not read preprocessed folder: {str(e)}")
+                return
             self.preprocessedfolder = folderselected
             foldername = os.path.basename(folderselected)
             self.preprocessedlabel.config(text=f"Preprocessed: {foldername}", fg='green')
@@ -440,99 +2049,432 @@ class ImageViewer(tk.Tk):
             messagebox.showinfo("No Selection", "No folder selected!")
 
     def loadpreprocessedimage(self, filename):
-        """NEW: Load the corresponding preprocessed image"""
+        """NEW: Locate the corresponding preprocessed image; pixels are decoded when the magnifier needs them"""
+        self.preprocessedpath = None
+        self.magnifierlevels = {}
+        self.magnifiersourcesize = None
+        self.magnifiertransform = None
+        self.tilecache.clear()
         if not self.preprocessedfolder:
-            self.preprocessedimage = None
             return
 
         # Try to find matching file in preprocessed folder
-        basename = os.path.splitext(filename)[0]
-
-        # Try different extensions
-        for ext in self.imageextensions:
-            preprocessedpath = os.path.join(self.preprocessedfolder, basename + ext)
-            if os.path.exists(preprocessedpath):
-                try:
-                    self.preprocessedimage = Image.open(preprocessedpath)
-                    print(f"Loaded preprocessed image: {preprocessedpath}")
-                    return
-                except Exception as e:
-                    print(f"Error loading preprocessed image: {e}")
-
-        # Also try exact filename match
-        preprocessedpath = os.path.join(self.preprocessedfolder, filename)
-        if os.path.exists(preprocessedpath):
-            try:
-                self.preprocessedimage = Image.open(preprocessedpath)
-                print(f"Loaded preprocessed image: {preprocessedpath}")
-                return
-            except Exception as e:
-                print(f"Error loading preprocessed image: {e}")
+        preprocessedpath = self.preprocessedindex.find(filename)
+        if preprocessedpath:
+            self.preprocessedpath = preprocessedpath
+            print(f"Found preprocessed image: {preprocessedpath}")
+            return
 
         # No matching preprocessed image found
-        self.preprocessedimage = None
         print(f"No preprocessed image found for: {filename}")
 
+    def showmissingpreprocessed(self):
+        """Report original images that have no preprocessed counterpart"""
+        if not self.preprocessedindex or not self.filenames:
+            messagebox.showinfo("Info", "Select both an original and a preprocessed folder first!")
+            return
+        self.preprocessedindex.refresh(force=True)
+        missing = self.preprocessedindex.missing(self.filenames)
+        if not missing:
+            messagebox.showinfo("Preprocessed Images", f"All {len(self.filenames)} images have a preprocessed version.")
+            return
+        for filename in missing:
+            print(f"No preprocessed image: {filename}")
+        shown = "\n".join(missing[:20])
+        if len(missing) > 20:
+            shown += f"\n... and {len(missing) - 20} more (full list printed to console)"
+        messagebox.showwarning("Preprocessed Images", f"{len(missing)} of {len(self.filenames)} images have "
+                                                      f"no preprocessed version:\n\n{shown}")
+
     def displayfilesinfolder(self, folderpath):
-        files = [f for f in os.listdir(folderpath) if
-                 os.path.isfile(os.path.join(folderpath, f)) and f.lower().endswith(self.imageextensions)]
-        files.sort()
-        self.filenames = files  # Store the actual filenames
-        self.filtered_indices = list(range(len(files)))  # Initially show all files
+        """Start scanning folderpath; files appear in the list as the scan finds them"""
+        self.abandonscan()
+        self.annotationindex = AnnotationIndex()
+        self.annotationcounts = {}
+        self.storedcounts = {}
+        self.filenames = []  # Store the actual filenames
+        self.searchindex = FilenameSearchIndex()
+        self.currentindex = -1
         self.clearsearch()  # Clear any existing search
+        self.scancancel = threading.Event()
+        self.scanbatches = deque()
+        self.watcher = FolderWatcher(folderpath, self.imageextensions, self.recursivevar.get())
+        self.manifest = FolderManifest(folderpath)
+        self.scanfuture = self.scanexecutor.submit(openimagefolder, folderpath, self.imageextensions,
+                                                   self.recursivevar.get(), self.scancancel, self.scanbatches,
+                                                   self.watcher, self.manifest)
+        self.scanlabel.config(text="Scanning...")
+        self.cancelscanbtn.config(state=tk.NORMAL)
+        self.scanjob = self.after(50, self.pollscan)
+
+    def pollscan(self):
+        """Move scanned batches into the file list, and sort once the scan is finished"""
+        self.scanjob = None
+        # Check before draining so the last batch is never left behind
+        finished = self.scanfuture.done()
+        while self.scanbatches:
+            images, sidecars = self.scanbatches.popleft()
+            for sidecar in sidecars:
+                self.annotationindex.add(sidecar)
+            self.addscannedfiles(images)
+        if not finished:
+            self.scanlabel.config(text=f"Scanning... {len(self.filenames)} files")
+            self.scanjob = self.after(50, self.pollscan)
+            return
+        failed = False
+        try:
+            imagesizes, annotationcounts = self.scanfuture.result()
+        except Exception as e:
+            # Whatever went wrong, finish so the list is sorted and Cancel is released
+            messagebox.showerror("Error", f"Could not read folder: {str(e)}")
+            imagesizes, annotationcounts = {}, {}
+            failed = True
+        for filename, entry in imagesizes.items():
+            self.imagecache.primesize(os.path.join(self.selectedfolder, filename), entry['mtime'],
+                                      (entry['width'], entry['height']))
+        # Checked against the sidecars by the background count after the scan
+        self.storedcounts = annotationcounts
+        self.finishscan(failed)
+
+    def addscannedfiles(self, images):
+        """Append newly found files, listing those that match the current search"""
+        if not images:
+            self.filelist.refresh()
+            return
+        start = len(self.filenames)
+        self.filenames.extend(images)
+        for filename in images:
+            self.searchindex.add(filename)
+        try:
+            match, _ = self.searchindex.matcher(self.searchvar.get())
+        except re.error:
+            match = lambda name: False
+        names = self.searchindex.names
+        self.extendfilteredindices(list(self.filterannotated(
+            i for i in range(start, len(self.filenames)) if match is None or match(names[i]))))
         self.refreshfilelistbox()
-        self.currentindex = -1
-        if files:
+        if self.currentindex < 0:
             self.selectimagebyindex(0)
 
+    def finishscan(self, failed=False):
+        """Sort the scanned files, keeping the current image selected"""
+        cancelled = self.scancancel.is_set()
+        self.scanfuture = None
+        self.cancelscanbtn.config(state=tk.DISABLED)
+        current = self.filenames[self.currentindex] if self.currentindex >= 0 else None
+        self.filenames.sort()
+        self.searchindex = FilenameSearchIndex(self.filenames)
+        if current is not None:
+            self.currentindex = bisect.bisect_left(self.filenames, current)
+        # Rebuild the filtered list in sorted order; the selection follows the current file
+        self.runsearch()
+        status = "Scan failed" if failed else "Scan cancelled" if cancelled else "Found"
+        self.scanlabel.config(text=f"{status}: {len(self.filenames)} files")
+        print(f"{status}: {len(self.filenames)} images in {self.selectedfolder}")
+        # A cancelled or failed scan has an incomplete baseline, so only a finished one is watched and saved
+        if cancelled or failed:
+            self.watcher = None
+            self.manifest = None
+        else:
+            self.savemanifest()
+            self.countsidecars()
+            self.watchjob = self.after(self.watchinterval, self.pollwatch)
+
+    def countsidecars(self):
+        """Read the class counts of sidecars that have none yet, on the scan worker"""
+        if self.watcher is None:
+            return
+        if self.countfuture is not None:
+            self.countagain = True
+            return
+        self.countagain = False
+        self.countfuture = self.scanexecutor.submit(countsidecars, self.watcher, set(self.annotationcounts),
+                                                    self.storedcounts)
+        self.countjob = self.after(100, self.pollcounts)
+
+    def pollcounts(self):
+        """Merge counted sidecars into the annotation index and re-apply count-based filters"""
+        self.countjob = None
+        if not self.countfuture.done():
+            self.countjob = self.after(100, self.pollcounts)
+            return
+        future, self.countfuture = self.countfuture, None
+        try:
+            counts = future.result()
+        except Exception as e:
+            print(f"Could not read annotation files: {e}")
+            return
+        # Counts recorded by saves in the meantime are newer
+        for key, entry in counts.items():
+            self.annotationcounts.setdefault(key, entry)
+        # The manifest's counts are now either validated above or stale
+        self.storedcounts = {}
+        print(f"Annotation counts ready for {len(counts)} annotation files")
+        if counts:
+            if self.annotationfilter() is not None:
+                self.runsearch()
+            self.savemanifest()
+        if self.countagain:
+            self.countsidecars()
+
+    def savemanifest(self):
+        """Write the folder manifest in the background"""
+        if self.manifest is None or self.watcher is None or self.scanfuture is not None:
+            return
+        present = set(self.filenames)
+        prefix = os.path.join(self.manifest.folderpath, '')
+        imagesizes = {}
+        for (path, mtime), (width, height) in self.imagecache.knownsizes().items():
+            filename = path[len(prefix):]
+            if path.startswith(prefix) and filename in present:
+                imagesizes[filename] = {'mtime': mtime, 'width': width, 'height': height}
+        # Manifest counts still awaiting validation are kept as they were; the next open checks them
+        annotationcounts = {key: entry for key, entry in itertools.chain(self.storedcounts.items(),
+                                                                         self.annotationcounts.items())
+                            if entry['sidecar'] and self.annotationindex.has(entry['sidecar'])}
+        # Queued behind any poll on the same worker, which owns the watcher state
+        self.scanexecutor.submit(self.manifest.save, self.watcher, imagesizes, annotationcounts)
+
+    def recordannotationcounts(self, filename, annotationfile, classificationkeys):
+        """Remember the per-class box counts of filename's sidecar for the manifest"""
+        counts = {}
+        for key in classificationkeys:
+            counts[key] = counts.get(key, 0) + 1
+        try:
+            mtime = os.stat(annotationfile).st_mtime_ns
+        except OSError:
+            return
+        self.annotationcounts[AnnotationIndex.key(filename)] = {
+            'sidecar': os.path.relpath(annotationfile, self.selectedfolder), 'mtime': mtime, 'counts': counts}
+
+    def cancelscan(self):
+        """Stop the running scan and keep the files found so far"""
+        if self.scancancel is not None:
+            self.scancancel.set()
+
+    def abandonscan(self):
+        """Stop the running scan and drop its results"""
+        self.savemanifest()
+        self.cancelscan()
+        if self.scanjob is not None:
+            self.after_cancel(self.scanjob)
+            self.scanjob = None
+        self.scanfuture = None
+        self.scanbatches = deque()
+        self.cancelscanbtn.config(state=tk.DISABLED)
+        if self.watchjob is not None:
+            self.after_cancel(self.watchjob)
+            self.watchjob = None
+        if self.countjob is not None:
+            self.after_cancel(self.countjob)
+            self.countjob = None
+        self.countfuture = None
+        self.countagain = False
+        self.storedcounts = {}
+        self.watcher = None
+        self.watchfuture = None
+        self.manifest = None
+
+    def pollwatch(self):
+        """Check the folder for changes on the worker and apply what it reports"""
+        self.watchjob = None
+        if self.watcher is None:
+            return
+        if self.watchfuture is None:
+            self.watchfuture = self.scanexecutor.submit(self.watcher.poll)
+        if not self.watchfuture.done():
+            self.watchjob = self.after(100, self.pollwatch)
+            return
+        future, self.watchfuture = self.watchfuture, None
+        try:
+            changes = future.result()
+        except Exception as e:
+            print(f"Could not check {self.selectedfolder} for changes: {e}")
+            changes = None
+        if changes:
+            self.applyfolderchanges(*changes)
+            # Sidecar-only changes, such as this viewer saving annotations, wait for close or folder switch
+            added, removed, renamed, _, _ = changes
+            if added or removed or renamed:
+                self.savemanifest()
+        self.watchjob = self.after(self.watchinterval, self.pollwatch)
+
+    def applyfolderchanges(self, added, removed, renamed, sidecarsadded, sidecarsremoved):
+        """Update the file list in place for files that appeared, disappeared or were renamed"""
+        for sidecar in sidecarsremoved:
+            self.annotationindex.discard(sidecar)
+            self.annotationcounts.pop(AnnotationIndex.key(sidecar), None)
+        for sidecar in sidecarsadded:
+            self.annotationindex.add(sidecar)
+            # Sidecars this viewer just wrote already have their counts; others are read below
+            entry = self.annotationcounts.get(AnnotationIndex.key(sidecar))
+            if entry is not None and entry['sidecar'] != sidecar:
+                del self.annotationcounts[AnnotationIndex.key(sidecar)]
+        if sidecarsadded:
+            self.countsidecars()
+
+        current = self.filenames[self.currentindex] if self.currentindex >= 0 else None
+        for oldname, newname in [pair for pair in renamed if pair[0] == current]:
+            # Renames are paired by mtime alone; carry the image on screen and its boxes over only
+            # when the new file is the one displayed, otherwise its boxes would be saved to another sidecar
+            try:
+                stat = os.stat(os.path.join(self.selectedfolder, newname))
+                verified = (stat.st_size, stat.st_mtime_ns) == self.originalstat
+            except OSError:
+                verified = False
+            if not verified:
+                renamed = [pair for pair in renamed if pair[0] != oldname]
+                removed = removed + [oldname]
+                added = added + [newname]
+        if renamed or removed:
+            positions = {filename: i for i, filename in enumerate(self.filenames)}
+            # Renamed files keep their place and serial number
+            for oldname, newname in renamed:
+                index = positions.get(oldname)
+                if index is not None:
+                    self.filenames[index] = newname
+                    self.searchindex.replace(index, newname)
+                    if oldname == current:
+                        # Same pixels under a new path; later decodes and relayouts must use it
+                        current = newname
+                        self.filenamelabel.config(text=newname)
+                        self.originalpath = os.path.join(self.selectedfolder, newname)
+                        self.magnifiertransform = None
+            if removed:
+                removedset = set(removed)
+                self.filenames = [filename for filename in self.filenames if filename not in removedset]
+                self.searchindex = FilenameSearchIndex(self.filenames)
+            if current in removed:
+                # The image on screen is gone; show the one that took its place
+                self.currentindex = -1
+                self.runsearch()
+                if self.filenames:
+                    self.selectimagebyindex(min(positions[current], len(self.filenames) - 1))
+                else:
+                    self.imagecanvas.delete('all')
+                    self.filenamelabel.config(text="Select an image to view")
+            else:
+                if current is not None:
+                    self.currentindex = self.filenames.index(current)
+                self.runsearch()
+
+        # New files are appended so existing serial numbers stay put
+        self.addscannedfiles(added)
+        print(f"Folder changed: {len(added)} added, {len(removed)} removed, {len(renamed)} renamed")
+        self.scanlabel.config(text=f"Watching: {len(self.filenames)} files")
+
     def refreshfilelistbox(self):
         """Refresh the file listbox based on current filter"""
-        self.filelistbox.delete(0, tk.END)
-        for display_idx, file_idx in enumerate(self.filtered_indices):
-            file = self.filenames[file_idx]
-            # Check if annotation file exists
-            basename = os.path.splitext(file)[0]
-            annotationfile = os.path.join(self.selectedfolder, f"{basename}.txt")
-            has_annotation = os.path.exists(annotationfile)
-
-            # Insert file with serial number and marker if annotated
-            serial_num = file_idx + 1  # 1-based serial number (original index)
-            checkmark = "✓" if has_annotation else " "
-            display_text = f"{serial_num:3d}. {checkmark} {file}"
-            self.filelistbox.insert(tk.END, display_text)
-
-            # Color annotated files differently
-            if has_annotation:
-                self.filelistbox.itemconfig(display_idx, {'fg': 'green', 'selectforeground': 'darkgreen'})
+        self.filelist.refresh()
+        self.filmstrip.refresh()
 
     def onsearchchange(self, *args):
-        """Handle search text change"""
-        searchtext = self.searchvar.get().lower().strip()
-        if not searchtext:
-            # Show all files
-            self.filtered_indices = list(range(len(self.filenames)))
+        """Handle search text change; the search runs once typing pauses"""
+        if self.searchjob is not None:
+            self.after_cancel(self.searchjob)
+        self.searchjob = self.after(self.searchdelay, self.runsearch)
+
+    def annotationfilter(self):
+        """Predicate on filenames for the status and class filters, or None when they are off
+
+        Answers come from the annotation index and the per-class counts, without reading sidecars.
+        Sidecars whose counts are still being read don't match the class or empty-save filters yet.
+        """
+        status = self.statusvar.get()
+        classkey = self.classfilters.get(self.classvar.get())
+        try:
+            minimum = max(1, int(self.classminvar.get()))
+        except ValueError:
+            minimum = 1
+        if status == self.statusfilters[0] and classkey is None:
+            return None
+        annotationindex = self.annotationindex
+        annotationcounts = self.annotationcounts
+
+        def matches(filename):
+            if status == "Unannotated":
+                return annotationindex is None or not annotationindex.has(filename)
+            if annotationindex is None or not annotationindex.has(filename):
+                return False
+            entry = annotationcounts.get(AnnotationIndex.key(filename))
+            if status == "Empty saves" and (entry is None or entry['counts']):
+                return False
+            if classkey is not None and (entry is None or entry['counts'].get(classkey, 0) < minimum):
+                return False
+            return True
+        return matches
+
+    def runsearch(self):
+        """Filter the file list by the search text, streaming matches into the list in batches"""
+        self.searchjob = None
+        if self.searchstreamjob is not None:
+            self.after_cancel(self.searchstreamjob)
+            self.searchstreamjob = None
+        try:
+            matches = self.searchindex.search(self.searchvar.get())
+        except re.error as e:
+            print(f"Invalid search pattern: {e}")
+            self.searchentry.config(bg='#ffdddd')
+            return
+        self.searchentry.config(bg='white')
+        matches = self.filterannotated(matches)
+        self.setfilteredindices([])
+        self.filelist.selection_clear()
+        self.streamsearch(matches)
+
+    def filterannotated(self, indices):
+        """File indices that also pass the status and class filters"""
+        match = self.annotationfilter()
+        if match is None:
+            return indices
+        filenames = self.filenames
+        return (i for i in indices if match(filenames[i]))
+
+    def streamsearch(self, matches):
+        """Add the next batch of search matches to the list"""
+        self.searchstreamjob = None
+        batch = list(itertools.islice(matches, self.searchbatch))
+        self.extendfilteredindices(batch)
+        self.filelist.refresh()
+
+        # Update selection once the current file shows up
+        display_idx = self.filteredposition(self.currentindex)
+        if display_idx is not None and display_idx >= len(self.filtered_indices) - len(batch):
+            self.filelist.selection_set(display_idx)
+            self.filelist.see(display_idx)
+
+        if len(batch) == self.searchbatch:
+            self.searchstreamjob = self.after(1, self.streamsearch, matches)
         else:
-            # Filter files matching search text
-            self.filtered_indices = [
-                i for i, filename in enumerate(self.filenames)
-                if searchtext in filename.lower()
-            ]
-        self.refreshfilelistbox()
+            self.filmstrip.refresh()
+            self.prefetchneighbours()
+
+    def setfilteredindices(self, indices):
+        """Replace the filtered list and its position map"""
+        self.filtered_indices = list(indices)
+        self.filteredpositions = {file_idx: position for position, file_idx in enumerate(self.filtered_indices)}
 
-        # Update selection if current file is still visible
-        if self.currentindex >= 0 and self.currentindex in self.filtered_indices:
-            display_idx = self.filtered_indices.index(self.currentindex)
-            self.filelistbox.selection_clear(0, tk.END)
-            self.filelistbox.selection_set(display_idx)
-            self.filelistbox.see(display_idx)
+    def extendfilteredindices(self, indices):
+        """Append file indices to the filtered list"""
+        start = len(self.filtered_indices)
+        self.filtered_indices.extend(indices)
+        for position in range(start, len(self.filtered_indices)):
+            self.filteredpositions[self.filtered_indices[position]] = position
+
+    def filteredposition(self, file_idx):
+        """Position of a file index in the filtered list, or None if it is filtered out"""
+        return self.filteredpositions.get(file_idx)
 
     def clearsearch(self):
-        """Clear the search field"""
+        """Clear the search field and list all files"""
         self.searchvar.set("")
+        if self.searchjob is not None:
+            self.after_cancel(self.searchjob)
+        self.runsearch()
 
     def onfileselect(self, event):
         """Handle manual selection from listbox"""
-        selectedindices = self.filelistbox.curselection()
+        selectedindices = self.filelist.curselection()
         if selectedindices:
             display_idx = selectedindices[0]
             # Map display index to actual file index
@@ -553,58 +2495,85 @@ class ImageViewer(tk.Tk):
         self.currentindex = index
 
         # Find display index in filtered list
-        self.filelistbox.selection_clear(0, tk.END)
-        if index in self.filtered_indices:
-            display_idx = self.filtered_indices.index(index)
-            self.filelistbox.selection_set(display_idx)
-            self.filelistbox.activate(display_idx)
-            self.filelistbox.see(display_idx)
+        self.filelist.selection_clear()
+        display_idx = self.filteredposition(index)
+        if display_idx is not None:
+            self.filelist.selection_set(display_idx)
+            self.filelist.see(display_idx)
 
         filename = self.filenames[index]
         self.filenamelabel.config(text=filename)
         self.displayimage(filename)
 
-    def previousimage(self):
-        """Navigate to previous image in filtered list"""
+    def prefetchneighbours(self):
+        """Queue decoding of the images around the current one in the filtered list"""
+        position = self.filteredposition(self.currentindex)
+        if position is None:
+            self.prefetcher.clear()
+            return
+        count = len(self.filtered_indices)
+        # Next images first, then previous ones; navigation wraps around like next/previous
+        offsets = list(range(1, self.prefetcher.ahead + 1)) + [-i for i in range(1, self.prefetcher.behind + 1)]
+        # The current image's magnifier source goes first so it is decoded before the magnifier asks for it
+        currentpath = os.path.join(self.selectedfolder, self.filenames[self.currentindex])
+        imagepaths = []
+        for offset in offsets:
+            fileidx = self.filtered_indices[(position + offset) % count]
+            if fileidx != self.currentindex:
+                imagepath = os.path.join(self.selectedfolder, self.filenames[fileidx])
+                if imagepath not in imagepaths:
+                    imagepaths.append(imagepath)
+        self.prefetcher.schedule(currentpath, imagepaths, self.preprocessedindex, self.getcanvassize())
+
+    def onfilmstripselect(self, index):
+        """Handle a click on a filmstrip thumbnail"""
+        if index == self.currentindex:
+            return
+        if self.currentindex >= 0:
+            self.saveannotations(self.filenames[self.currentindex])
+        self.selectimagebyindex(index)
+
+    def gotofilteredposition(self, position):
+        """Save the current annotations and show the image at position in the filtered list"""
         if self.currentindex >= 0:
             currentfilename = self.filenames[self.currentindex]
             self.saveannotations(currentfilename)
         if len(self.filtered_indices) == 0:
             messagebox.showinfo("Info", "No images loaded!")
             return
+        self.selectimagebyindex(self.filtered_indices[position % len(self.filtered_indices)])
 
-        # Find current position in filtered list and go to previous
-        if self.currentindex in self.filtered_indices:
-            current_display_idx = self.filtered_indices.index(self.currentindex)
-            new_display_idx = current_display_idx - 1
-            if new_display_idx < 0:
-                new_display_idx = len(self.filtered_indices) - 1
-        else:
-            new_display_idx = len(self.filtered_indices) - 1
-
-        newindex = self.filtered_indices[new_display_idx]
-        self.selectimagebyindex(newindex)
+    def previousimage(self):
+        """Navigate to previous image in filtered list"""
+        # Wraps to the last image; a current image that is filtered out also goes to the last one
+        position = self.filteredposition(self.currentindex)
+        self.gotofilteredposition(-1 if position is None else position - 1)
 
     def nextimage(self):
         """Navigate to next image in filtered list"""
-        if self.currentindex >= 0:
-            currentfilename = self.filenames[self.currentindex]
-            self.saveannotations(currentfilename)
-        if len(self.filtered_indices) == 0:
-            messagebox.showinfo("Info", "No images loaded!")
-            return
+        position = self.filteredposition(self.currentindex)
+        self.gotofilteredposition(0 if position is None else position + 1)
 
-        # Find current position in filtered list and go to next
-        if self.currentindex in self.filtered_indices:
-            current_display_idx = self.filtered_indices.index(self.currentindex)
-            new_display_idx = current_display_idx + 1
-            if new_display_idx >= len(self.filtered_indices):
-                new_display_idx = 0
-        else:
-            new_display_idx = 0
+    def firstimage(self):
+        """Navigate to the first image in filtered list"""
+        self.gotofilteredposition(0)
 
-        newindex = self.filtered_indices[new_display_idx]
-        self.selectimagebyindex(newindex)
+    def lastimage(self):
+        """Navigate to the last image in filtered list"""
+        self.gotofilteredposition(-1)
+
+    def jumptoimage(self):
+        """Ask for a serial number and navigate to that image"""
+        if not self.filenames:
+            messagebox.showinfo("Info", "No images loaded!")
+            return
+        serial = simpledialog.askinteger("Go To Image", f"Image number (1-{len(self.filenames)}):", parent=self,
+                                         minvalue=1, maxvalue=len(self.filenames))
+        if serial is None or serial - 1 == self.currentindex:
+            return
+        if self.currentindex >= 0:
+            self.saveannotations(self.filenames[self.currentindex])
+        self.selectimagebyindex(serial - 1)
 
     def displayimage(self, filename):
         """Display image on canvas and clear existing bounding boxes"""
@@ -612,41 +2581,85 @@ class ImageViewer(tk.Tk):
             return
         imagepath = os.path.join(self.selectedfolder, filename)
         try:
-            self.originalimage = Image.open(imagepath)
+            canvassize = self.getcanvassize()
+            # A prefetch of this image may be mid-decode; its results land in the image cache
+            self.prefetcher.wait(imagepath)
+            self.originalpath = imagepath
+            stat = os.stat(imagepath)
+            self.originalstat = (stat.st_size, stat.st_mtime_ns)
+            self.originalsize = self.imagecache.headersize(imagepath)
 
             # NEW: Load corresponding preprocessed image
             self.loadpreprocessedimage(filename)
 
             self.imagecanvas.delete('all')
-            self.imagecanvas.update_idletasks()
-            canvaswidth = self.imagecanvas.winfo_width()
-            canvasheight = self.imagecanvas.winfo_height()
-            if canvaswidth <= 1 or canvasheight <= 1:
-                canvaswidth = 800
-                canvasheight = 600
-            imgwidth, imgheight = self.originalimage.size
-            scalew = canvaswidth / imgwidth
-            scaleh = canvasheight / imgheight
             # FIXED: Remove the 1.0 constraint to allow images to scale down to fit
-            self.displayscale = min(scalew, scaleh)
-            newwidth = int(imgwidth * self.displayscale)
-            newheight = int(imgheight * self.displayscale)
-            self.imageoffsetx = (canvaswidth - newwidth) // 2
-            self.imageoffsety = (canvasheight - newheight) // 2
-            imgresized = self.originalimage.resize((newwidth, newheight), Image.Resampling.LANCZOS)
-            self.currentimage = ImageTk.PhotoImage(imgresized)
-            self.imagecanvas.create_image(self.imageoffsetx, self.imageoffsety, anchor=tk.NW, image=self.currentimage)
+            self.displayscale, _, _, self.imageoffsetx, self.imageoffsety = fitimage(self.originalsize, canvassize)
+            self.canvasimageid = None
+            self.drawrendition(imagepath, canvassize)
             self.loadannotations(filename)
 
             # NEW: Update magnifier title based on preprocessed image availability
-            if self.preprocessedimage:
+            if self.preprocessedpath:
                 self.magnifiertitle.config(text="Magnifier (Preprocessed)")
             else:
                 self.magnifiertitle.config(text="Magnifier (Original)")
 
+            self.filmstrip.showcurrent()
+            self.prefetchneighbours()
         except Exception as e:
             messagebox.showerror("Error", f"Could not load image: {str(e)}")
 
+    def drawrendition(self, imagepath, canvassize):
+        """Draw the canvas rendition at the current offsets, refining a quick preview in the background"""
+        self.refinejob = None
+        imgresized = self.imagecache.rendition(imagepath, canvassize, cachedonly=True)
+        refine = False
+        if imgresized is None:
+            if self.renderquality == 'quality':
+                imgresized = self.imagecache.rendition(imagepath, canvassize)
+            else:
+                imgresized = self.imagecache.rendition(imagepath, canvassize, self.previewresample)
+                refine = self.renderquality == 'progressive'
+        self.currentimage = ImageTk.PhotoImage(imgresized)
+        if self.canvasimageid is None:
+            self.canvasimageid = self.imagecanvas.create_image(self.imageoffsetx, self.imageoffsety, anchor=tk.NW,
+                                                               image=self.currentimage)
+        else:
+            self.imagecanvas.coords(self.canvasimageid, self.imageoffsetx, self.imageoffsety)
+            self.imagecanvas.itemconfig(self.canvasimageid, image=self.currentimage)
+        self.canvassize = canvassize
+        if refine:
+            self.refinejob = self.prefetcher.submit(self.imagecache.rendition, imagepath, canvassize)
+            self.after(20, self.pollrefinement, self.refinejob)
+
+    def pollrefinement(self, job):
+        """Swap the high-quality rendition in under the boxes once the worker has it"""
+        if job is not self.refinejob:
+            job.cancel()
+            return
+        if not job.done():
+            self.after(20, self.pollrefinement, job)
+            return
+        self.refinejob = None
+        try:
+            imgrefined = job.result()
+        except Exception as e:
+            print(f"Could not refine rendition: {e}")
+            return
+        self.currentimage = ImageTk.PhotoImage(imgrefined)
+        self.imagecanvas.itemconfig(self.canvasimageid, image=self.currentimage)
+
+    def getcanvassize(self):
+        """Current image canvas size, with a fallback before the window is mapped"""
+        self.imagecanvas.update_idletasks()
+        canvaswidth = self.imagecanvas.winfo_width()
+        canvasheight = self.imagecanvas.winfo_height()
+        if canvaswidth <= 1 or canvasheight <= 1:
+            canvaswidth = 800
+            canvasheight = 600
+        return canvaswidth, canvasheight
+
     def oncanvasclick(self, event):
         """Handle canvas click - start drawing bounding box or select existing"""
         clickedbox = self.findboxatpoint(event.x, event.y)
@@ -664,11 +2677,9 @@ class ImageViewer(tk.Tk):
         self.drawingbox = True
 
     def findboxatpoint(self, x, y):
-        """Find bounding box at given point"""
-        for bbox in reversed(self.boundingboxes):
-            if bbox.contains_point(x, y):
-                return bbox
-        return None
+        """Find the topmost bounding box at given canvas point"""
+        origx, origy = self.canvastoimage(x, y)
+        return self.boxindex.atpoint(origx, origy, BoundingBox.HITMARGIN / self.displayscale)
 
     def oncanvasdrag(self, event):
         """Handle canvas drag - update bounding box preview"""
@@ -679,9 +2690,17 @@ class ImageViewer(tk.Tk):
                                                                   outline='red', width=2)
             self.updatemagnifier(event.x, event.y)
 
+    def pollmagnifiersource(self):
+        """Render the frame skipped while the magnifier source was prefetching, once it is ready"""
+        self.magnifierpoll = None
+        if self.prefetcher.sourcepending(self.originalpath):
+            self.magnifierpoll = self.after(20, self.pollmagnifiersource)
+        else:
+            self.magnifierscheduler.request(*self.magnifierwaiting)
+
     def updatemagnifier(self, canvasx, canvasy):
         """Update magnifier with current cursor position"""
-        self.onmousemove(type('Event', (), {'x': canvasx, 'y': canvasy})())
+        self.magnifierscheduler.request(canvasx, canvasy)
 
     def oncanvasrelease(self, event):
         """Handle mouse release - finalize bounding box"""
@@ -690,8 +2709,9 @@ class ImageViewer(tk.Tk):
             if abs(event.x - self.startx) > 5 and abs(event.y - self.starty) > 5:
                 if self.currentboxid:
                     self.imagecanvas.delete(self.currentboxid)
-                bbox = BoundingBox(self.startx, self.starty, event.x, event.y)
+                bbox = BoundingBox(*self.canvastoimage(self.startx, self.starty), *self.canvastoimage(event.x, event.y))
                 self.boundingboxes.append(bbox)
+                self.boxindex.insert(bbox)
                 self.pendingclassification = bbox
                 self.classificationmode = True
                 canvasid = self.imagecanvas.create_rectangle(self.startx, self.starty, event.x, event.y,
@@ -756,10 +2776,7 @@ class ImageViewer(tk.Tk):
     def showboxinfo(self):
         """Show information about selected bounding box"""
         if self.selectedbox:
-            origx1 = (self.selectedbox.x1 - self.imageoffsetx) / self.displayscale
-            origy1 = (self.selectedbox.y1 - self.imageoffsety) / self.displayscale
-            origx2 = (self.selectedbox.x2 - self.imageoffsetx) / self.displayscale
-            origy2 = (self.selectedbox.y2 - self.imageoffsety) / self.displayscale
+            origx1, origy1, origx2, origy2 = self.selectedbox.get_coords()
             width = abs(origx2 - origx1)
             height = abs(origy2 - origy1)
 
@@ -790,6 +2807,7 @@ class ImageViewer(tk.Tk):
             if bbox.canvasid:
                 self.imagecanvas.delete(bbox.canvasid)
         self.boundingboxes.clear()
+        self.boxindex.clear()
         self.selectedbox = None
         self.updateannotationlist()
         self.updatestatusbar()
@@ -799,6 +2817,7 @@ class ImageViewer(tk.Tk):
         if self.selectedbox:
             self.imagecanvas.delete(self.selectedbox.canvasid)
             self.boundingboxes.remove(self.selectedbox)
+            self.boxindex.remove(self.selectedbox)
             self.selectedbox = None
             self.updateannotationlist()
             self.updatestatusbar()
@@ -872,6 +2891,7 @@ class ImageViewer(tk.Tk):
             if bbox.canvasid:
                 self.imagecanvas.delete(bbox.canvasid)
             self.boundingboxes.remove(bbox)
+            self.boxindex.remove(bbox)
         return len(unclassifiedboxes)
 
     def saveannotations(self, filename):
@@ -891,16 +2911,12 @@ class ImageViewer(tk.Tk):
             annotationdata = {
                 'imagefilename': filename,
                 'imagepath': os.path.join(self.selectedfolder, filename),
-                'imagesize': (self.originalimage.width if self.originalimage else 0,
-                              self.originalimage.height if self.originalimage else 0),
+                'imagesize': self.originalsize if self.originalsize else (0, 0),
                 'annotations': []
             }
 
             for i, bbox in enumerate(classifiedboxes):
-                origx1 = (bbox.x1 - self.imageoffsetx) / self.displayscale
-                origy1 = (bbox.y1 - self.imageoffsety) / self.displayscale
-                origx2 = (bbox.x2 - self.imageoffsetx) / self.displayscale
-                origy2 = (bbox.y2 - self.imageoffsety) / self.displayscale
+                origx1, origy1, origx2, origy2 = bbox.get_coords()
                 width = abs(origx2 - origx1)
                 height = abs(origy2 - origy1)
                 centerx = (origx1 + origx2) / 2
@@ -923,6 +2939,9 @@ class ImageViewer(tk.Tk):
 
             with open(annotationfile, 'w') as f:
                 json.dump(annotationdata, f, indent=2)
+            self.annotationindex.add(filename)
+            self.recordannotationcounts(filename, annotationfile, [bbox.classification for bbox in classifiedboxes])
+            self.filelist.refresh()
             print(f"Saved {len(classifiedboxes)} classified annotations to {annotationfile}")
 
             unclassifiedcount = len(self.boundingboxes) - len(classifiedboxes)
@@ -934,47 +2953,47 @@ class ImageViewer(tk.Tk):
     def loadannotations(self, filename):
         """Load bounding box coordinates and classifications from JSON file"""
         self.boundingboxes.clear()
+        self.boxindex.clear()
 
         basename = os.path.splitext(filename)[0]
         annotationfile = os.path.join(self.selectedfolder, f"{basename}.txt")
         if not os.path.exists(annotationfile):
+            # Keep the file list marker honest if the sidecar was removed outside the tool
+            self.annotationindex.discard(filename)
             self.updateannotationlist()
             return
+        self.annotationindex.add(filename)
         try:
             with open(annotationfile, 'r') as f:
                 content = f.read().strip()
             if not content:
                 print(f"Empty annotation file: {annotationfile}")
+                self.recordannotationcounts(filename, annotationfile, [])
                 self.updateannotationlist()
                 return
             try:
                 annotationdata = json.loads(content)
             except json.JSONDecodeError as e:
                 print(f"Invalid JSON in {annotationfile}: {e}")
+                self.recordannotationcounts(filename, annotationfile, [])
                 self.updateannotationlist()
                 return
 
             for annotation in annotationdata.get('annotations', []):
                 bboxdata = annotation['bbox']
                 classificationdata = annotation['classification']
-                origx1 = bboxdata['x1']
-                origy1 = bboxdata['y1']
-                origx2 = bboxdata['x2']
-                origy2 = bboxdata['y2']
-
-                canvasx1 = origx1 * self.displayscale + self.imageoffsetx
-                canvasy1 = origy1 * self.displayscale + self.imageoffsety
-                canvasx2 = origx2 * self.displayscale + self.imageoffsetx
-                canvasy2 = origy2 * self.displayscale + self.imageoffsety
-
                 classificationkey = classificationdata['key']
-                bbox = BoundingBox(canvasx1, canvasy1, canvasx2, canvasy2)
+                bbox = BoundingBox(bboxdata['x1'], bboxdata['y1'], bboxdata['x2'], bboxdata['y2'])
                 bbox.classification = classificationkey
                 color = bbox.get_color() if hasattr(bbox, 'get_color') else '#0000FF'
-                canvasid = self.imagecanvas.create_rectangle(canvasx1, canvasy1, canvasx2, canvasy2, outline=color,
+                canvasid = self.imagecanvas.create_rectangle(*bbox.canvas_coords(self.currentview()), outline=color,
                                                              width=2, tags=bbox)
                 bbox.canvasid = canvasid
                 self.boundingboxes.append(bbox)
+                self.boxindex.insert(bbox)
+            self.recordannotationcounts(filename, annotationfile,
+                                        [annotation['classification']['key'] for annotation in
+                                         annotationdata.get('annotations', [])])
             print(f"Loaded {len(annotationdata.get('annotations', []))} annotations")
             self.updateannotationlist()
         except Exception as e:
@@ -999,5 +3018,27 @@ class ImageViewer(tk.Tk):
 
 
 if __name__ == "__main__":
-    app = ImageViewer()
-    app.mainloop()
+    parser = argparse.ArgumentParser(description="Joly AI Image Annotator")
+    parser.add_argument('--disk-cache', nargs='?', const=DEFAULTDISKCACHEDIR, metavar='DIR',
+                        help=f"keep decoded pixels on disk between sessions (default dir: {DEFAULTDISKCACHEDIR})")
+    parser.add_argument('--disk-cache-limit', type=int, default=4096, metavar='MB',
+                        help="disk cache size limit in megabytes (default: 4096)")
+    parser.add_argument('--memory-cache-limit', type=int, default=1024, metavar='MB',
+                        help="in-memory decoded image cache size limit in megabytes (default: 1024)")
+    parser.add_argument('--evict-cache', action='store_true', help="trim the disk cache to its limit and exit")
+    parser.add_argument('--clear-cache', action='store_true', help="delete everything in the disk cache and exit")
+    parser.add_argument('--thumbnail-cache', default=DEFAULTTHUMBNAILDIR, metavar='DIR',
+                        help=f"where filmstrip thumbnails are cached (default: {DEFAULTTHUMBNAILDIR})")
+    parser.add_argument('--render-quality', choices=('progressive', 'quality', 'fast'), default='progressive',
+                        help="progressive: quick preview, then LANCZOS; quality: wait for LANCZOS; fast: preview only")
+    args = parser.parse_args()
+
+    if args.evict_cache or args.clear_cache:
+        diskcache = DiskPixelCache(args.disk_cache or DEFAULTDISKCACHEDIR, limit=args.disk_cache_limit * 1024 * 1024)
+        removed, freed = diskcache.clear() if args.clear_cache else diskcache.evict()
+        print(f"Removed {removed} cache entries ({freed / 1048576:.0f} MB) from {diskcache.directory}")
+    else:
+        app = ImageViewer(diskcachedir=args.disk_cache, diskcachelimit=args.disk_cache_limit * 1024 * 1024,
+                          renderquality=args.render_quality, thumbnaildir=args.thumbnail_cache,
+                          memorycachelimit=args.memory_cache_limit * 1024 * 1024)
+        app.mainloop()